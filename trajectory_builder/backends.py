@@ -0,0 +1,102 @@
+import numpy as np
+
+
+# Event kinds
+MOVE = 0
+CLICK = 1
+# time is time.perf_counter() based deadline of the event, x and y are screen coords
+EVENT_DTYPE = np.dtype([("time", "<f8"), ("kind", "u1"), ("x", "<f8"), ("y", "<f8")])
+
+
+def build_events(points, clicks=None, times=None):
+    """
+    Events of a trajectory: a move per point, a click right after the move for every clicked point
+    :param points: (N, 2) float array of x, y
+    :param clicks: (N,) bool array of the points to click at. Default = no clicks
+    :param times: (N,) float array of the points deadlines. Default = zeros
+    :return: tuple of EVENT_DTYPE array and (N,) int array of the move events positions in it
+    """
+    size = points.shape[0]
+    clicks = np.zeros(size, dtype=bool) if clicks is None else np.asarray(clicks, dtype=bool)
+    # Every click shifts the following moves by one event
+    moves = np.arange(size) + np.concatenate(([0], np.cumsum(clicks)[:-1])).astype(np.int64)
+
+    events = np.zeros(size + int(clicks.sum()), dtype=EVENT_DTYPE)
+    events["kind"][moves] = MOVE
+    events["x"][moves] = points[:, 0]
+    events["y"][moves] = points[:, 1]
+    click_events = moves[clicks] + 1
+    events["kind"][click_events] = CLICK
+    events["x"][click_events] = points[clicks, 0]
+    events["y"][click_events] = points[clicks, 1]
+    if times is not None:
+        events["time"][moves] = times
+        events["time"][click_events] = times[clicks]
+    return events, moves
+
+
+class Backend:
+    """
+    Receiver of the mouse events in chunks, see MouseMover.mouse_move_batched(). Subclasses override send(),
+    which gets an EVENT_DTYPE array ordered by time. Chunks are sent no earlier than their first event deadline,
+    the rest of the events timing is up to the backend
+    """
+    def send(self, events):
+        """Called with every chunk of events"""
+        raise NotImplementedError
+
+    def close(self):
+        """Called when the backend is not used anymore"""
+        pass
+
+
+class CallbackBackend(Backend):
+    """Passes the events to the move and click functions one by one, ignoring their deadlines"""
+    def __init__(self, move_func, click_func):
+        """
+        :param move_func: outer function for moving the mouse
+        :param click_func same, but for clicking
+        """
+        self.move_func = move_func
+        self.click_func = click_func
+
+    def send(self, events):
+        for _, kind, x, y in events.tolist():
+            if kind == CLICK:
+                self.click_func(x, y)
+            else:
+                self.move_func(x, y)
+
+
+class RecordingBackend(Backend):
+    """Keeps all the events in memory instead of moving the mouse. Used for tests and benchmarks"""
+    def __init__(self):
+        self.chunks = []
+
+    def send(self, events):
+        self.chunks.append(events.copy())
+
+    def __len__(self):
+        return sum(chunk.shape[0] for chunk in self.chunks)
+
+    @property
+    def events(self):
+        """All the events received, EVENT_DTYPE array"""
+        if not self.chunks:
+            return np.zeros(0, dtype=EVENT_DTYPE)
+        return np.concatenate(self.chunks)
+
+    def moves(self):
+        """(N, 2) float array of the moves x, y"""
+        events = self.events
+        events = events[events["kind"] == MOVE]
+        return np.stack((events["x"], events["y"]), axis=1)
+
+    def clicks(self):
+        """(N, 2) float array of the clicks x, y"""
+        events = self.events
+        events = events[events["kind"] == CLICK]
+        return np.stack((events["x"], events["y"]), axis=1)
+
+    def clear(self):
+        self.chunks = []
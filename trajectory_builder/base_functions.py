@@ -1,5 +1,11 @@
 import numpy as np
 import math
+from functools import lru_cache
+
+
+# Degree from which curve points are evaluated with de Casteljau algorithm instead of the power basis.
+# Binomials and t ** i terms lose precision fast on high degrees, de Casteljau is slower but stable
+DE_CASTELJAU_DEGREE = 24
 
 
 def is_numeric(val):
@@ -18,6 +24,76 @@ def is_list_of_points(l):
         return False
 
 
+def as_points(points, name: str = "points"):
+    """
+    Validates a list (or an array) of numeric points once and returns it as (N, 2) float array.
+    Use it at the public boundary and pass the array further without repeated checks
+    """
+    raw = np.asarray(points) if not isinstance(points, np.ndarray) else points
+    if raw.size == 0:
+        return np.empty((0, 2))
+    if raw.dtype.kind not in "biuf" or raw.ndim != 2 or raw.shape[1] != 2:
+        raise ValueError(f"{name} must be valid list of points")
+    return raw.astype(np.float64, copy=False)
+
+
+def broadcast_param(val, size, dtype=np.float64):
+    """Returns a parameter given either as a single value or a sequence of values as an array of the given size"""
+    try:
+        return np.broadcast_to(np.asarray(val, dtype=dtype), (size,))
+    except ValueError:
+        raise ValueError(f"Parameter must be a single value or a sequence of {size} values")
+
+
+def to_unit_frame(points, start, end):
+    """
+    Moves the points to the frame where start is (0, 0) and end is (1, 0). Rotation and scaling only
+    :param points: (N, 2) array-like
+    :return: (N, 2) float array
+    """
+    points = np.asarray(points, dtype=np.float64)
+    direction = np.subtract(end, start, dtype=np.float64)
+    shifted = (points - start) / np.dot(direction, direction)
+    return np.stack((shifted @ direction, shifted[:, 1] * direction[0] - shifted[:, 0] * direction[1]), axis=1)
+
+
+def direction_angle(start, end):
+    """
+    Direction of the start-end move folded into [0, pi / 2) range. Curve knots are picked from the start-end box,
+    so curves of the moves at right angles to each other are alike in the unit frame, and of the other directions are not
+    :param start: (2,) or (N, 2) array-like
+    :param end: same
+    :return: float or (N,) float array, radians
+    """
+    direction = np.subtract(end, start, dtype=np.float64)
+    return np.mod(np.arctan2(direction[..., 1], direction[..., 0]), np.pi / 2)
+
+
+def angle_bucket(angle, count: int):
+    """
+    Index of the direction bucket, the right angle is split into count buckets evenly. Works for arrays as well
+    :param angle: folded direction, see direction_angle()
+    """
+    return np.minimum((np.asarray(angle) / (np.pi / 2) * count).astype(np.int64), count - 1)
+
+
+def angle_buckets(count: int):
+    """Middle directions of the count buckets, radians"""
+    return (np.arange(count) + 0.5) * (np.pi / 2 / count)
+
+
+def from_unit_frame(points, start, end):
+    """
+    Moves the points from the frame where start is (0, 0) and end is (1, 0) onto the given start and end points
+    :param points: (N, 2) array-like
+    :return: (N, 2) float array
+    """
+    points = np.asarray(points, dtype=np.float64)
+    direction = np.subtract(end, start, dtype=np.float64)
+    return np.stack((start[0] + points[:, 0] * direction[0] - points[:, 1] * direction[1],
+                     start[1] + points[:, 0] * direction[1] + points[:, 1] * direction[0]), axis=1)
+
+
 class BezierCurve:
     """Base class used for Bezier curves building"""
     @staticmethod
@@ -46,14 +122,61 @@ class BezierCurve:
             return x, y
         return bern
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def binomial_row(n):
+        """Returns all the binomial coefficients of degree n as a read-only float array. Cached per degree"""
+        row = np.array([math.comb(n, k) for k in range(n + 1)], dtype=np.float64)
+        row.flags.writeable = False
+        return row
+
+    @staticmethod
+    def bernstein_basis(t, n):
+        """
+        Returns Bernstein basis matrix of degree n for all the parameters at once
+        :param t: array of curve parameters in [0, 1] range
+        :param n: curve degree (control points number - 1)
+        :return: (len(t), n + 1) float array
+        """
+        t = np.asarray(t, dtype=np.float64).reshape(-1, 1)
+        k = np.arange(n + 1)
+        return BezierCurve.binomial_row(n) * (t ** k) * ((1 - t) ** (n - k))
+
+    @staticmethod
+    def de_casteljau(t, points):
+        """
+        Evaluates Bezier curve with de Casteljau algorithm for all the parameters at once
+        :param t: array of curve parameters in [0, 1] range
+        :param points: (n + 1, 2) array of control points or (len(t), n + 1, 2) array of control points per parameter
+        :return: (len(t), 2) float array
+        """
+        t = np.asarray(t, dtype=np.float64).reshape(-1, 1, 1)
+        beta = np.broadcast_to(points, (t.shape[0],) + points.shape[-2:]).copy()
+        for _ in range(1, points.shape[-2]):
+            beta = beta[:, :-1] + (beta[:, 1:] - beta[:, :-1]) * t
+        return beta[:, 0]
+
+    @staticmethod
+    def points_at(t, points):
+        """
+        Given list of control points, returns the points of the bezier curve at the given parameters
+        :param t: array of curve parameters in [0, 1] range
+        :param points: control points, list of (x, y) or (n + 1, 2) array.
+        Also may be (len(t), n + 1, 2) array of control points per parameter to evaluate different curves at once
+        :return: (len(t), 2) float array
+        """
+        points = np.asarray(points, dtype=np.float64)
+        n = points.shape[-2] - 1
+        if n >= DE_CASTELJAU_DEGREE:
+            return BezierCurve.de_casteljau(t, points)
+        if points.ndim == 3:
+            return np.einsum("ij,ijk->ik", BezierCurve.bernstein_basis(t, n), points)
+        return BezierCurve.bernstein_basis(t, n) @ points
+
     @staticmethod
     def curve_points(n, points):
         """
         Given list of control points, returns n points in the bezier curve, described by these points
+        :return: (n, 2) float array
         """
-        curve_points = []
-        bernstein_polynomial = BezierCurve.bernstein_polynomial(points)
-        for i in range(n):
-            t = i / (n - 1)
-            curve_points += bernstein_polynomial(t)
-        return curve_points
+        return BezierCurve.points_at(np.linspace(0., 1., int(n)), points)
@@ -0,0 +1,187 @@
+"""
+Benchmark suite of curves generation and mouse moves playback.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --compare results.json --tolerance 0.2 --memory-tolerance 0.1
+
+Every case reports wall time per call, per-stage time (see instrumentation) and peak traced memory.
+Compare mode fails (exit code 1) if any case got slower or its peak memory grew compared to the baseline
+by more than the tolerance
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+from trajectory import HumanCurve
+from mouse_mover import MouseMover
+from backends import RecordingBackend
+from instrumentation import Instrumentation, HistogramSink
+
+
+# Move distances, px: from a tiny correction up to the 4K diagonal
+DISTANCES = (10, 100, 500, 1000, 2000, 4406)
+KNOTS_COUNTS = (1, 2, 3, 5, 10)
+TARGET_POINTS = (30, 120, 500)
+INTERP_STEPS = (5, 20)
+# Calls of each case are split into rounds, the best round is reported
+ROUNDS = 5
+
+
+def measure(func, repeat: int):
+    """
+    Runs func repeat times with instrumentation passed to it, then once more to trace the memory
+    :return: dict of wall time per call (best and mean of the rounds, seconds), stages time per call (seconds)
+    and peak memory (bytes)
+    """
+    sink = HistogramSink()
+    instrumentation = Instrumentation(sink)
+    # Warm up: caches, lazy imports
+    func(instrumentation)
+    sink.reset()
+
+    # Best of a few rounds is far less noisy than the mean of all the calls
+    round_size = max(repeat // ROUNDS, 1)
+    rounds = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(round_size):
+            func(instrumentation)
+        rounds.append((time.perf_counter() - start) / round_size)
+    stages = {name: stats["total"] / (round_size * ROUNDS) for name, stats in sink.summary()["stages"].items()}
+
+    # Memory is traced in a separate call, tracing slows everything down a lot
+    tracemalloc.start()
+    func(instrumentation)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"wall": min(rounds), "wall_mean": float(np.mean(rounds)), "stages": stages, "peak_memory": peak}
+
+
+def curve_cases(repeat: int, seed: int):
+    """HumanCurve generation over distances, knots counts, target points and interpolation steps"""
+    rng = np.random.default_rng(seed)
+    for distance in DISTANCES:
+        for knots_count in KNOTS_COUNTS:
+            for target_points in TARGET_POINTS:
+                for interp_step in INTERP_STEPS:
+                    name = f"curve/d={distance}/knots={knots_count}/points={target_points}/interp={interp_step}"
+                    end = (distance * 0.8, distance * 0.6)
+
+                    def generate(instrumentation):
+                        # Points are evaluated lazily, reading them measures the whole generation
+                        HumanCurve((0, 0), end, rng=rng, knots_count=knots_count, target_points=target_points,
+                                   interp_step=interp_step, instrumentation=instrumentation).points
+
+                    yield name, measure(generate, repeat)
+
+
+def batch_cases(repeat: int, seed: int):
+    """HumanCurve.generate_batch over batch sizes"""
+    rng = np.random.default_rng(seed)
+    for size in (100, 1000, 10000):
+        starts = rng.integers(0, 3840, size=(size, 2))
+        ends = rng.integers(0, 2160, size=(size, 2))
+
+        def generate(instrumentation):
+            HumanCurve.generate_batch(starts, ends, rng=rng, knots_count=rng.integers(1, 4, size=size),
+                                      target_points=rng.integers(30, 121, size=size), instrumentation=instrumentation)
+
+        yield f"batch/size={size}", measure(generate, max(repeat // 10, 1))
+
+
+def playback_cases(repeat: int, seed: int):
+    """
+    MouseMover.mouse_move with no-op move and click functions and mouse_move_batched with the recording backend,
+    no scheduler
+    """
+    for distance in DISTANCES:
+        x, y = int(distance * 0.8), int(distance * 0.6)
+
+        def move(instrumentation):
+            mover = MouseMover(3840, 2160, seed=seed, instrumentation=instrumentation)
+            mover.mouse_move(lambda *args: None, lambda *args: None, x, y, x + 10, y + 10, allow_fakes=True)
+
+        def move_batched(instrumentation):
+            mover = MouseMover(3840, 2160, seed=seed, instrumentation=instrumentation)
+            mover.mouse_move_batched(RecordingBackend(), x, y, x + 10, y + 10, allow_fakes=True)
+
+        yield f"mouse_move/d={distance}", measure(move, repeat)
+        yield f"mouse_move_batched/d={distance}", measure(move_batched, repeat)
+
+
+def run(repeat: int, seed: int):
+    """Runs all the cases. Results are keyed by case name"""
+    results = {}
+    for cases in (curve_cases, batch_cases, playback_cases):
+        for name, result in cases(repeat, seed):
+            results[name] = result
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                     "repeat": repeat, "seed": seed},
+            "results": results}
+
+
+def compare(results: dict, baseline: dict, tolerance: float, memory_tolerance: float = None):
+    """
+    Compares wall times and peak memory of the cases present in both runs
+    :param tolerance: allowed wall time growth ratio
+    :param memory_tolerance: allowed peak memory growth ratio. Default = tolerance
+    :return: list of (case name, metric, baseline value, current value, ratio) of the regressed cases metrics,
+    metric is either "wall" or "peak_memory"
+    """
+    if memory_tolerance is None:
+        memory_tolerance = tolerance
+    regressions = []
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric, allowed in (("wall", tolerance), ("peak_memory", memory_tolerance)):
+            # Baselines of older runs may lack a metric
+            if base.get(metric, 0) <= 0 or metric not in result:
+                continue
+            ratio = result[metric] / base[metric]
+            if ratio > 1 + allowed:
+                regressions.append((name, metric, base[metric], result[metric], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Curves generation and playback benchmarks")
+    parser.add_argument("--repeat", type=int, default=50, help="calls per case")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the generated curves")
+    parser.add_argument("--output", help="file to write the results to, JSON. Default = stdout")
+    parser.add_argument("--compare", help="baseline results file to check the regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio. Default = 0.2")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1,
+                        help="allowed peak memory growth ratio. Default = 0.1")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.seed)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        for name, metric, base, current, ratio in regressions:
+            if metric == "wall":
+                values = f"{base * 1e3:.3f} ms -> {current * 1e3:.3f} ms"
+            else:
+                values = f"{base / 1024:.1f} KiB -> {current / 1024:.1f} KiB peak memory"
+            print(f"REGRESSION {name}: {values} (x{ratio:.2f})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
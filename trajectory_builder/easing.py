@@ -0,0 +1,143 @@
+"""
+Easing (tweening) functions as cached lookup tables, so every move applies its easing with array operations
+instead of a function call per point. Any function taking a float 0..1 and returning a float 0..1 may be used,
+e.g. the pytweening ones. Piecewise profiles combine a few of them into a human-like velocity model.
+"""
+from functools import lru_cache
+import numpy as np
+import pytweening
+
+
+DEFAULT_EASING = pytweening.easeOutQuad
+# Table size used to evaluate the easings at arbitrary progress values, linearly interpolated in between
+RESOLUTION = 1024
+
+# Slopes of the easings at their ends: velocity the easing starts or finishes with, relative to its average one.
+# Used to join the parts of the random profiles without velocity jumps
+ACCELERATIONS = ((pytweening.easeInSine, np.pi / 2), (pytweening.easeInQuad, 2.), (pytweening.easeInCubic, 3.))
+SLOWDOWNS = ((pytweening.easeOutSine, np.pi / 2), (pytweening.easeOutQuad, 2.), (pytweening.easeOutCubic, 3.))
+
+
+def get_easing(tween):
+    """Easing function by itself or by pytweening name, e.g. "easeOutCubic" """
+    if isinstance(tween, str):
+        if not tween.startswith(("ease", "linear")) or not hasattr(pytweening, tween):
+            raise ValueError(f"Unknown easing: {tween}")
+        return getattr(pytweening, tween)
+    if not callable(tween):
+        raise ValueError("tweening must be either a function or a pytweening function name")
+    return tween
+
+
+@lru_cache(maxsize=512)
+def easing_table(tween, resolution: int):
+    """
+    Values of the easing at resolution evenly spaced points of [0, 1]: tween(i / (resolution - 1)).
+    For resolution equal to the points number, these are exactly the curve points progress values. Cached, read-only
+    :return: (resolution,) float array
+    """
+    if resolution < 2:
+        raise ValueError("resolution must be an integer greater or equal to 2")
+    if isinstance(tween, Piecewise):
+        table = tween.evaluate(np.linspace(0., 1., resolution))
+    else:
+        # The only per-point calls, made once per easing and resolution
+        table = np.array([tween(float(i) / (resolution - 1)) for i in range(resolution)], dtype=np.float64)
+    table.setflags(write=False)
+    return table
+
+
+def ease(tween, progress, resolution: int = RESOLUTION):
+    """
+    Vectorized easing: values at arbitrary progress values, interpolated over the cached table
+    :param progress: float array-like of values in [0, 1]
+    :return: float array
+    """
+    table = easing_table(tween, resolution)
+    return np.interp(np.asarray(progress, dtype=np.float64) * (resolution - 1), np.arange(resolution), table)
+
+
+class Piecewise:
+    """
+    Velocity profile made of easings, each one covering a share of the move time and a share of the distance.
+    Callable as a tweening function, so it may be passed wherever a pytweening one is accepted.
+    Profiles with equal parts are equal, so they share the cached tables
+    """
+    __slots__ = ("parts", "_time", "_progress")
+
+    def __init__(self, parts):
+        """
+        :param parts: sequence of (tween, time share, distance share). Shares are positive, normalized to sum up to 1
+        """
+        parts = tuple((get_easing(tween), float(time_share), float(distance_share))
+                      for tween, time_share, distance_share in parts)
+        if not parts or any(time_share <= 0 or distance_share <= 0 for _, time_share, distance_share in parts):
+            raise ValueError("Profile must have parts with positive time and distance shares")
+        self.parts = parts
+        self._time = self._bounds([part[1] for part in parts])
+        self._progress = self._bounds([part[2] for part in parts])
+
+    @staticmethod
+    def _bounds(shares):
+        """Normalized cumulative shares starting at 0 and ending exactly at 1"""
+        bounds = np.concatenate(([0.], np.cumsum(shares)))
+        bounds /= bounds[-1]
+        bounds[-1] = 1.
+        return bounds
+
+    def evaluate(self, progress):
+        """
+        Profile values at the given time progress values
+        :param progress: float array of values in [0, 1]
+        :return: float array
+        """
+        progress = np.asarray(progress, dtype=np.float64)
+        part = np.clip(np.searchsorted(self._time, progress, side="right") - 1, 0, len(self.parts) - 1)
+        local = (progress - self._time[part]) / (self._time[part + 1] - self._time[part])
+
+        eased = np.empty_like(local)
+        for indx, (tween, _, _) in enumerate(self.parts):
+            mask = part == indx
+            eased[mask] = ease(tween, local[mask])
+        return self._progress[part] + (self._progress[part + 1] - self._progress[part]) * eased
+
+    def __call__(self, progress):
+        return float(self.evaluate(progress)) if np.ndim(progress) == 0 else self.evaluate(progress)
+
+    def __eq__(self, other):
+        return isinstance(other, Piecewise) and self.parts == other.parts
+
+    def __hash__(self):
+        return hash(self.parts)
+
+    def __repr__(self):
+        return "Piecewise(" + ", ".join(f"({getattr(tween, '__name__', tween)}, {time_share:.3f}, {distance_share:.3f})"
+                                        for tween, time_share, distance_share in self.parts) + ")"
+
+
+def random_profile(rng=None, burst_probability: float = 0.3):
+    """
+    Random human-like velocity profile: acceleration, cruise and slowdown on the end. Sometimes the cruise
+    speeds up or slows down midway (a burst). Parts are joined at equal velocities, bursts only change it abruptly
+    :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
+    :param burst_probability: chance of a cruise velocity change
+    :return: Piecewise
+    """
+    rng = np.random.default_rng(rng)
+    acceleration, acceleration_slope = ACCELERATIONS[rng.integers(len(ACCELERATIONS))]
+    slowdown, slowdown_slope = SLOWDOWNS[rng.integers(len(SLOWDOWNS))]
+    acceleration_time = rng.uniform(0.1, 0.3)
+    slowdown_time = rng.uniform(0.3, 0.5)
+    cruise_time = 1. - acceleration_time - slowdown_time
+
+    # Cruise is split in two, the second part is faster or slower by the burst ratio
+    split = rng.uniform(0.3, 0.7)
+    burst = rng.uniform(0.6, 1.6) if rng.random() < burst_probability else 1.
+    # Velocity of the first cruise part, all the distance shares sum up to 1
+    velocity = 1. / (acceleration_time / acceleration_slope + cruise_time * split +
+                     burst * (cruise_time * (1 - split) + slowdown_time / slowdown_slope))
+
+    return Piecewise(((acceleration, acceleration_time, velocity * acceleration_time / acceleration_slope),
+                      (pytweening.linear, cruise_time * split, velocity * cruise_time * split),
+                      (pytweening.linear, cruise_time * (1 - split), velocity * burst * cruise_time * (1 - split)),
+                      (slowdown, slowdown_time, velocity * burst * slowdown_time / slowdown_slope)))
@@ -0,0 +1,152 @@
+import time
+import logging
+import threading
+from contextlib import nullcontext
+import numpy as np
+
+
+class Sink:
+    """
+    Base class of the instrumentation sinks. Override any of the methods, the rest of them ignore the data
+    """
+    def timing(self, name: str, seconds: float):
+        """Called when a stage named name is finished"""
+        pass
+
+    def count(self, name: str, value: int):
+        """Called when a counter named name is increased by value"""
+        pass
+
+    def event(self, name: str, fields: dict):
+        """Called on a single event, e.g. a point emitted"""
+        pass
+
+
+class LoggingSink(Sink):
+    """Writes everything to a logger"""
+    def __init__(self, logger: logging.Logger = None, level: int = logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger("mouse_mover")
+        self.level = level
+
+    def timing(self, name, seconds):
+        self.logger.log(self.level, "stage %s: %.6f s", name, seconds)
+
+    def count(self, name, value):
+        self.logger.log(self.level, "counter %s: +%d", name, value)
+
+    def event(self, name, fields):
+        self.logger.log(self.level, "%s - %s", name, ", ".join(f"{key}:{val}" for key, val in fields.items()))
+
+
+class HistogramSink(Sink):
+    """Keeps stage timings and counters in memory. Events are ignored. Thread-safe"""
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def timing(self, name, seconds):
+        with self._lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """
+        Per-stage statistics (seconds) and counters
+        :return: dict of {"stages": {name: {"calls", "total", "mean", "p50", "p95", "max"}}, "counters": {name: value}}
+        """
+        with self._lock:
+            stages = {}
+            for name, values in self.timings.items():
+                values = np.asarray(values)
+                stages[name] = {"calls": len(values), "total": float(values.sum()), "mean": float(values.mean()),
+                                "p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+                                "max": float(values.max())}
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.timings.clear()
+            self.counters.clear()
+
+
+class CallbackSink(Sink):
+    """Passes the data to the given functions, any of them may be omitted"""
+    def __init__(self, on_timing=None, on_count=None, on_event=None):
+        self.on_timing = on_timing
+        self.on_count = on_count
+        self.on_event = on_event
+
+    def timing(self, name, seconds):
+        if self.on_timing is not None:
+            self.on_timing(name, seconds)
+
+    def count(self, name, value):
+        if self.on_count is not None:
+            self.on_count(name, value)
+
+    def event(self, name, fields):
+        if self.on_event is not None:
+            self.on_event(name, fields)
+
+
+class _Stage:
+    """Context manager measuring a stage duration"""
+    __slots__ = ("_sinks", "_name", "_start")
+
+    def __init__(self, sinks, name):
+        self._sinks = sinks
+        self._name = name
+        self._start = 0.
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        for sink in self._sinks:
+            sink.timing(self._name, seconds)
+        return False
+
+
+_NO_STAGE = nullcontext()
+
+
+class Instrumentation:
+    """
+    Per-stage timing hooks, counters and events passed to the sinks.
+    Instance without sinks is disabled: hooks return at once and callers may check enabled to skip preparing event data.
+    \n
+    Stages: knots, interpolation, tweening, bezier, distortion (curve generation) and playback.
+    Counters: points_generated, points_emitted, fake_clicks.
+    Events: curve, calibration, move, fake_click
+    """
+    __slots__ = ("sinks", "enabled")
+
+    def __init__(self, *sinks: Sink):
+        self.sinks = sinks
+        self.enabled = bool(sinks)
+
+    def stage(self, name: str):
+        """Context manager measuring the stage duration"""
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self.sinks, name)
+
+    def count(self, name: str, value: int = 1):
+        if self.enabled:
+            for sink in self.sinks:
+                sink.count(name, value)
+
+    def event(self, name: str, **fields):
+        if self.enabled:
+            for sink in self.sinks:
+                sink.event(name, fields)
+
+
+# Default instrumentation, does nothing
+DISABLED = Instrumentation()
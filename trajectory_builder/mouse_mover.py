@@ -1,14 +1,28 @@
+import os
 import time
-from random import choices, seed, randrange
-from datetime import datetime
+import itertools
+import json
+import asyncio
+import platform
+import tempfile
+from functools import lru_cache
 import numpy as np
-from trajectory import HumanCurve
+from trajectory import HumanCurve, Trajectory
+from prefetch import TrajectoryPrefetcher
+from playback import PlaybackScheduler, maybe_await
+from instrumentation import Instrumentation, DISABLED
+from templates import TemplateLibrary, DEFAULT_DISTANCES, ANGLE_BUCKETS
+from render import Renderer, write_png
+from backends import Backend, build_events, MOVE, CLICK
+from easing import random_profile
 import random
-import psutil
-import cv2 as cv
 
 
-def get_distance(cur_x, cur_y, dest_x, dest_y, max_val=np.Inf):
+# File to keep CPU frequency measurement in between the processes. Opt-in: by default it is kept in memory only
+FREQ_CACHE_PATH = os.environ.get("MOUSE_MOVER_FREQ_CACHE", "")
+
+
+def get_distance(cur_x, cur_y, dest_x, dest_y, max_val=np.inf):
     """
     Counting distance from a current position to a target point, clipping by (0, max value) range
     :return: float value of a distance
@@ -16,41 +30,125 @@ def get_distance(cur_x, cur_y, dest_x, dest_y, max_val=np.Inf):
     return np.clip(np.sqrt((dest_x - cur_x) ** 2 + (dest_y - cur_y) ** 2), 0, max_val)
 
 
-def get_freq():
-    """Getting average frequency value to further point number scaling"""
+@lru_cache(maxsize=None)
+def get_freq(cache_path: str = FREQ_CACHE_PATH):
+    """
+    Getting average frequency value to further point number scaling.
+    Measured once per process. If cache_path is set, the value is also stored in that file to be reused by the next
+    processes on this machine
+    :param cache_path: cache file path, empty = no file. Default = MOUSE_MOVER_FREQ_CACHE environment variable
+    """
+    machine = f"{platform.node()}/{os.cpu_count()}"
+    if cache_path:
+        try:
+            with open(cache_path) as cache:
+                cached = json.load(cache)
+            if cached["machine"] == machine:
+                return float(cached["freq"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    import psutil
+
     freq = 0.
     cycles = 1000
     for times in range(cycles):
         freq += psutil.cpu_freq()[0]
 
     freq /= (cycles / psutil.cpu_count(True))
+
+    if cache_path:
+        # Unique temporary file created exclusively, so nothing else is written through a planted file or symlink
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".mouse_mover_freq.", dir=os.path.dirname(os.path.abspath(cache_path)))
+            with os.fdopen(fd, "w") as cache:
+                json.dump({"machine": machine, "freq": freq}, cache)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
     return freq
 
 
+async def run_moves(moves, limit: int = None):
+    """
+    Runs a lot of moves concurrently in the current event loop
+
+    :param moves: awaitables, e.g. mouse_move_async() calls of different movers
+    :param limit: max number of moves running at once. Default = no limit
+    :return: results of the moves, in the same order
+
+    >>> # Usage example:
+    >>> movers = [MouseMover(1920, 1080) for _ in range(300)]
+    >>> asyncio.run(run_moves(mover.mouse_move_async(move, click, 100, 100, 200, 200) for mover in movers))
+    """
+    if limit is None:
+        return await asyncio.gather(*moves)
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def limited(move):
+        async with semaphore:
+            return await move
+
+    return await asyncio.gather(*map(limited, moves))
+
+
 class MouseMover:
     """
     mouse_move() - baseline method to use. Includes clicking and actual moving, so remove this if you intend to use curve generator only
-    mouse_move_test() - visualization method including curve generation only. Uses OpenCV to draw the curves
+    mouse_move_test() - visualization method including curve generation only. Draws the curves with render.Renderer
+    mouse_move_path() - continuous move through a few boxes, clicking at each of them
     \n
-    By default, class uses points scaling adjusted by CPU. Please, remove all related code if you don't need this feature
+    By default, class moves the mouse as fast as move_func allows and uses points scaling adjusted by CPU to keep
+    the speed sane. Pass a PlaybackScheduler to get real time control instead, no scaling is applied then
     """
-    def __init__(self, width: int, height: int, x: float = 0, y: float = 0):
+    def __init__(self, width: int, height: int, x: float = 0, y: float = 0, seed=None,
+                 scheduler: PlaybackScheduler = None, instrumentation: Instrumentation = None,
+                 templates: TemplateLibrary = None, random_velocity: bool = False):
+        """
+        :param width: screen width
+        :param height: screen height
+        :param x: initial cursor position
+        :param y: initial cursor position
+        :param seed: numpy.random.Generator or a seed for a new one. Every random choice of the instance is made with it,
+        so movers with equal seeds produce equal moves. Default = unpredictably seeded generator
+        :param scheduler: real time playback of the moves. Default = no timing, points are emitted back-to-back
+        :param instrumentation: stages timings, counters and per-point events receiver. Default = disabled
+        :param templates: library of pregenerated curves to take the curves from instead of generating them,
+        see build_templates(). Default = no library
+        :param random_velocity: give every move a random human-like velocity profile (acceleration, cruise with
+        occasional bursts, slowdown), see easing.random_profile(). Templates keep the default easing.
+        Default = easeOutQuad for all the moves
+        """
         self.x = x
         self.y = y
         self.width = width
         self.height = height
+        self._rng = np.random.default_rng(seed)
+        self._prefetcher = None
+        self.scheduler = scheduler
+        # Report of the most recent move played with the scheduler
+        self.last_playback = None
+        self.instrumentation = instrumentation if instrumentation is not None else DISABLED
+        self.templates = templates
+        self.random_velocity = random_velocity
         self.screen = None
 
-        # These lines are used only for visualization / debug purposes
+        # These lines are used only for visualization / debug purposes. Buffers are allocated on first use
         self.shape = (800, 1800, 3)
-        self.screen = np.zeros(self.shape)
-        self.prev_screen = np.zeros(self.shape)
+        self._prev_screen = None
 
         # Used for normalize points number by cpu frequency (since it was tested on a few PCs).
-        # I advise to delete all related code
-        self._freq = get_freq()
+        # Measured on first use only, see _calibrate(). I advise to delete all related code
+        self._freq = None
         self._canonic_freq = 50000.0  # Measured during some tests
-        self._freq_ratio = self._freq / self._canonic_freq
+        self._freq_ratio = None
 
         # Current preferred max values
         self._max_points = 120
@@ -60,6 +158,27 @@ class MouseMover:
         self._lowest_min_points = 5
         self._lowest_max_points = 17
 
+        self._min_points_scaled = None
+        self._max_points_scaled = None
+
+        return
+
+    @property
+    def prev_screen(self):
+        """Visualization background, allocated on first use"""
+        if self._prev_screen is None:
+            self._prev_screen = np.zeros(self.shape, dtype=np.uint8)
+        return self._prev_screen
+
+    @prev_screen.setter
+    def prev_screen(self, value):
+        self._prev_screen = value
+
+    def _calibrate(self):
+        """Scales the points number limits by CPU frequency. The frequency itself is measured once, see get_freq()"""
+        self._freq = get_freq()
+        self._freq_ratio = self._freq / self._canonic_freq
+
         # Counting min points for current machine and clipping by 5 at lower border (we still want some curve,
         # not just 2 points). Same for
         self._min_points_scaled = int(np.clip(int(self._min_points * self._freq_ratio),
@@ -67,13 +186,85 @@ class MouseMover:
         self._max_points_scaled = int(np.clip(int(self._max_points * self._freq_ratio),
                                               self._lowest_max_points, self._max_points))
 
-        print("Res points: ", self._min_points_scaled, self._max_points_scaled)
+        self.instrumentation.event("calibration", min_points=self._min_points_scaled, max_points=self._max_points_scaled)
 
-        return
+    def start_prefetch(self, queue_size: int = 8, workers: int = 1, buckets=None, angles: int = 16):
+        """
+        Starts background curve generation, so moves may start without waiting for a curve to be built.
+        Curves are prepared for generic distances and directions and fitted onto the actual moves, see TrajectoryPrefetcher
+
+        :param queue_size: max number of ready curves per distance bucket
+        :param workers: number of background threads
+        :param buckets: distances to prepare curves for. Default = powers of sqrt(2) from 16 to 4096 px
+        :param angles: number of direction buckets in a right angle
+        """
+        self.stop_prefetch()
+        # Calibrating here, so the workers don't run it concurrently on their first curves
+        self._points_limits
+        self._prefetcher = TrajectoryPrefetcher(self._prefetch_curve, buckets, queue_size, workers, self._rng, angles)
+        self._prefetcher.start()
+
+    def stop_prefetch(self):
+        """Stops background curve generation, moves generate their curves synchronously again"""
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher = None
+
+    @property
+    def prefetch_stats(self):
+        """Prefetch hit / miss counters and the number of ready curves, None if prefetching is off"""
+        return self._prefetcher.stats if self._prefetcher is not None else None
+
+    def _prefetch_curve(self, distance, angle, rng):
+        """Curve of the given length and direction, built with the same params as the actual moves"""
+        return self._generate_curve(0, 0, distance * np.cos(angle), distance * np.sin(angle), self.width, self.height,
+                                    *self._points_limits, rng, self.instrumentation, self.random_velocity)
+
+    def build_templates(self, path: str, distances=DEFAULT_DISTANCES, per_distance: int = 16):
+        """
+        Generates a curve template library with the same curve params as the moves of this mover use and loads it.
+        The file may be loaded by the other movers with TemplateLibrary(path)
+
+        :param path: library file path
+        :param distances: distances to generate the templates for, px
+        :param per_distance: number of templates per distance in every direction bucket, see TemplateLibrary.build()
+        """
+        params = [self._curve_params(distance, self.height, *self._points_limits, self._rng)
+                  for distance in distances for _ in range(per_distance * ANGLE_BUCKETS)]
+        TemplateLibrary.build(path, distances, per_distance, self._rng,
+                              **{key: [param[key] for param in params] for key in params[0]})
+        self.templates = TemplateLibrary(path)
+
+    def _curve_to(self, dest_x, dest_y):
+        """
+        Curve from the current position to the destination point: a prefetched one if available,
+        a template from the library if there is one, a new one otherwise
+        :return: Trajectory
+        """
+        if self._prefetcher is not None:
+            res = self._prefetcher.get((self.x, self.y), (dest_x, dest_y))
+            if res is not None:
+                return res
+        if self.templates is not None:
+            res = self.templates.sample((self.x, self.y), (dest_x, dest_y), self._rng)
+            if res is not None:
+                return Trajectory(res)
+        return self._generate_curve(self.x, self.y, dest_x, dest_y, self.width, self.height, *self._points_limits,
+                                    self._rng, self.instrumentation, self.random_velocity)
+
+    @property
+    def _points_limits(self):
+        """Min and max curve points number. Scaled by CPU frequency unless the moves are timed by the scheduler"""
+        if self.scheduler is not None:
+            return self._min_points, self._max_points
+        if self._max_points_scaled is None:
+            self._calibrate()
+        return self._min_points_scaled, self._max_points_scaled
 
     def mouse_move(self, move_func, click_func, top_left_x, top_left_y, bottom_right_x, bottom_right_y, allow_fakes: bool = False, click_thershold: int = 5):
         """
-        Baseline method of moving the mouse. Includes moving itself and clicking. Method uses output since that info used by logger
+        Baseline method of moving the mouse. Includes moving itself and clicking.
+        Every point is reported to the mover instrumentation, use LoggingSink to log them
 
         :param move_func: outer function for moving the mouse
         :param click_func same, but for clicking
@@ -86,56 +277,418 @@ class MouseMover:
         :param allow_fakes: use to imitate human excessive clicking. Clicks are performed only in a small area around the target one
         :param click_thershold: area size around the target point. Used during fake-clicking (only)
 
+        :return: playback report if the mover has a scheduler, see PlaybackScheduler.report()
+        """
+        dest_x, dest_y, trajectory = self._plan_move(top_left_x, top_left_y, bottom_right_x, bottom_right_y,
+                                                     allow_fakes, click_thershold)
+
+        report = self._play(trajectory, move_func, click_func)
+
+        self.x = dest_x
+        self.y = dest_y
+
+        return report
+
+    async def mouse_move_async(self, move_func, click_func, top_left_x, top_left_y, bottom_right_x, bottom_right_y,
+                               allow_fakes: bool = False, click_thershold: int = 5):
         """
-        # For better random
-        seed_core = datetime.now().microsecond
-        seed(seed_core)
+        Same as mouse_move(), but awaits between the points instead of blocking, so a lot of movers may run
+        in one event loop (see run_moves()). The scheduler, if any, sleeps only, it never spins.
+
+        :param move_func: outer function for moving the mouse, either a plain or a coroutine function
+        :param click_func same, but for clicking
 
-        # Box center random point
-        dest_x = randrange(int(top_left_x) + 1, int(bottom_right_x) - 1)
-        dest_y = randrange(int(top_left_y) + 1, int(bottom_right_y) - 1)
+        :return: playback report if the mover has a scheduler, see PlaybackScheduler.report()
+        """
+        dest_x, dest_y, trajectory = self._plan_move(top_left_x, top_left_y, bottom_right_x, bottom_right_y,
+                                                     allow_fakes, click_thershold)
 
-        res = self._generate_curve(self.x, self.y, dest_x, dest_y, self.width, self.height,
-                                   self._min_points_scaled, self._max_points_scaled)
+        report = await self._play_async(trajectory, move_func, click_func)
+
+        self.x = dest_x
+        self.y = dest_y
+
+        return report
+
+    def mouse_move_stream(self, move_func, click_func, top_left_x, top_left_y, bottom_right_x, bottom_right_y,
+                          allow_fakes: bool = False, click_thershold: int = 5):
+        """
+        Same as mouse_move(), but the points are generated chunk by chunk while moving, so the first ones are emitted
+        at once. The move is a generator, yielding (x, y, is_fake_click) steps after emitting them.
+        Send a new (top_left_x, top_left_y, bottom_right_x, bottom_right_y) box to it to retarget the move mid-flight:
+        the curve goes on from the current position and direction to the new box. send() returns the current step
+        once again, so the steps are not lost when sending from a for loop. \n
+        Always generates a new curve, prefetched ones and templates are not used.
+        The scheduler, if any, is used at the rate of the initial curve
+
+        stream = mover.mouse_move_stream(move, click, *box)
+        for x, y, is_click in stream:
+            if box_moved():
+                stream.send(new_box)
+
+        :return: playback report if the mover has a scheduler (as StopIteration value), see PlaybackScheduler.report()
+        """
+        dest_x, dest_y = self._pick_destination(top_left_x, top_left_y, bottom_right_x, bottom_right_y)
+        curve = self._human_curve(self.x, self.y, dest_x, dest_y, self.width, self.height, *self._points_limits,
+                                  self._rng, self.instrumentation, self.random_velocity)
+        is_fake_click = self._fake_clicker(allow_fakes, click_thershold)
+
+        start_time = time.perf_counter()
+        scheduler = self.scheduler
+        if scheduler is not None:
+            interval = scheduler.interval(len(curve))
+            lateness = []
+        if self.instrumentation.enabled:
+            self.instrumentation.event("move", number=-1, time=0., x=self.x, y=self.y)
+
+        points = self._stream_points(curve, dest_x, dest_y)
+        steps_count = clicks_count = 0
+        last = (self.x, self.y)
+        try:
+            point = next(points)
+            while point is not None:
+                if scheduler is not None:
+                    deadline = start_time + steps_count * interval
+                    scheduler.wait(deadline)
+                    lateness.append(time.perf_counter() - deadline)
+
+                x, y = float(np.clip(point[0], 0, self.width - 1)), float(np.clip(point[1], 0, self.height - 1))
+                is_click = is_fake_click(x, y, dest_x, dest_y)
+                move_func(x, y)
+                self._trace_step(steps_count, x, y, start_time)
+                if is_click:
+                    self._trace_step(steps_count, x, y, start_time, Trajectory.CLICK | Trajectory.FAKE)
+                    click_func(x, y)
+                steps_count += 1
+                clicks_count += is_click
+                # Clipped, the position stays on the screen if the stream is closed early
+                last = (x, y)
+
+                retarget = None
+                box = yield x, y, is_click
+                while box is not None:
+                    retarget = self._pick_destination(*box)
+                    # Sending step gets the same step back, so it is not lost by a for loop over the stream
+                    box = yield x, y, is_click
+                if retarget is not None:
+                    dest_x, dest_y = retarget
+                point = points.send(retarget) if retarget is not None else next(points, None)
+        finally:
+            self.x, self.y = last
+            self._count_steps(steps_count, clicks_count)
+
+        if scheduler is not None:
+            self.last_playback = scheduler.report(np.array(lateness), time.perf_counter() - start_time)
+            return self.last_playback
+
+    @staticmethod
+    def _stream_points(curve, dest_x, dest_y):
+        """
+        Curve points stream, ends with the destination point. Send a new destination to retarget it,
+        the stream goes on with the continuation curve then
+        """
+        points = curve.iter_points()
+        previous = point = None
+        while True:
+            dest = None
+            for point in points:
+                dest = yield point
+                if dest is not None:
+                    break
+                previous = point
+            if dest is None:
+                if point == (dest_x, dest_y):
+                    return
+                # Adding target point so the algorithm won't skip it for sure
+                previous, point = point, (dest_x, dest_y)
+                dest = yield point
+                if dest is None:
+                    return
+
+            # Continuing from the last point with the current velocity
+            dest_x, dest_y = dest
+            previous = previous or point
+            curve = curve.continuation(point, dest, (point[0] - previous[0], point[1] - previous[1]))
+            points = itertools.islice(curve.iter_points(), 1, None)
+            previous = point
+
+    def mouse_move_batched(self, backend: Backend, top_left_x, top_left_y, bottom_right_x, bottom_right_y,
+                           allow_fakes: bool = False, click_thershold: int = 5, chunk_size: int = 32):
+        """
+        Same as mouse_move(), but the move and click events are passed to the backend in chunks instead of
+        a call per point, see backends.Backend. \n
+        With the scheduler, events are stamped with their deadlines and every chunk is sent at its first event
+        deadline. With no scheduler, the chunks are sent back-to-back, stamped with the sending time
+
+        :param backend: receiver of the events, e.g. backends.RecordingBackend
+        :param chunk_size: points per chunk, clicks go in the same chunk as their points
+
+        :return: playback report if the mover has a scheduler (lateness of the chunks), see PlaybackScheduler.report()
+        """
+        dest_x, dest_y, trajectory = self._plan_move(top_left_x, top_left_y, bottom_right_x, bottom_right_y,
+                                                     allow_fakes, click_thershold)
+
+        instrumentation = self.instrumentation
+        scheduler = self.scheduler
+        start_time = time.perf_counter()
+        # Offsets are float32, deadlines need float64 precision: perf_counter() values are large
+        times = start_time + trajectory.times.astype(np.float64) if trajectory.times is not None else None
+        events, moves = build_events(trajectory.xy, trajectory.clicks, times)
+        bounds = np.append(moves[::max(chunk_size, 1)], events.shape[0])
+        lateness = np.empty(bounds.shape[0] - 1)
+
+        with instrumentation.stage("playback"):
+            for indx in range(bounds.shape[0] - 1):
+                chunk = events[bounds[indx]:bounds[indx + 1]]
+                if scheduler is not None:
+                    scheduler.wait(chunk["time"][0])
+                    lateness[indx] = time.perf_counter() - chunk["time"][0]
+                else:
+                    chunk["time"] = time.perf_counter()
+                backend.send(chunk)
+        self._count_steps(len(trajectory), int(trajectory.clicks.sum()))
+
+        if instrumentation.enabled:
+            instrumentation.event("move", number=-1, time=0., x=self.x, y=self.y)
+            numbers = np.cumsum(events["kind"] == MOVE) - 1
+            for number, (event_time, kind, x, y) in zip(numbers.tolist(), events.tolist()):
+                instrumentation.event("fake_click" if kind == CLICK else "move", number=number,
+                                      time=event_time - start_time, x=x, y=y)
 
+        self.x = dest_x
+        self.y = dest_y
+
+        if scheduler is not None:
+            self.last_playback = scheduler.report(lateness, time.perf_counter() - start_time)
+            return self.last_playback
+
+    def mouse_move_path(self, move_func, click_func, boxes, allow_fakes: bool = False, click_thershold: int = 5,
+                        click_waypoints: bool = True):
+        """
+        Moves through a sequence of boxes in one continuous trajectory, e.g. to fill a few fields and press a button.
+        Curves of all the legs are generated in one batch and joined without sharp turns, the points are emitted
+        by a single playback loop. With the scheduler, its duration covers the whole path. \n
+        Prefetched curves and templates are not used
+
+        :param move_func: outer function for moving the mouse
+        :param click_func same, but for clicking
+        :param boxes: sequence of (top_left_x, top_left_y, bottom_right_x, bottom_right_y) boxes to pass in order
+
+        :param allow_fakes: use to imitate human excessive clicking around every waypoint
+        :param click_thershold: area size around the waypoints. Used during fake-clicking (only)
+        :param click_waypoints: click at every waypoint, use False to pass them only
+
+        :return: playback report if the mover has a scheduler, see PlaybackScheduler.report()
+        """
+        dest_x, dest_y, trajectory = self._plan_path(boxes, allow_fakes, click_thershold, click_waypoints)
+
+        report = self._play(trajectory, move_func, click_func)
+
+        self.x = dest_x
+        self.y = dest_y
+
+        return report
+
+    def _play(self, trajectory: Trajectory, move_func, click_func):
+        """
+        Emits the planned trajectory point by point: with the scheduler if the mover has one, back-to-back otherwise.
+        Points flagged with Trajectory.CLICK are clicked at, the ones also flagged with Trajectory.FAKE are
+        reported as fake clicks
+        :return: playback report if the mover has a scheduler, see PlaybackScheduler.report()
+        """
+        steps, start_time = self._start_playback(trajectory)
+
+        def process(indx, step):
+            x, y, flags = step
+            move_func(x, y)
+            self._trace_step(indx, x, y, start_time)
+            if flags & Trajectory.CLICK:
+                self._trace_step(indx, x, y, start_time, flags)
+                click_func(x, y)
+
+        report = None
+        with self.instrumentation.stage("playback"):
+            if self.scheduler is not None:
+                report = self.last_playback = self.scheduler.play(steps, process)
+            else:
+                for indx, step in enumerate(steps):
+                    process(indx, step)
+        self._count_steps(len(steps), int(np.count_nonzero(trajectory.flags & Trajectory.FAKE)))
+
+        return report
+
+    async def _play_async(self, trajectory: Trajectory, move_func, click_func):
+        """
+        Same as _play(), but awaits the functions and the scheduler, letting the other tasks run between the points
+        :return: playback report if the mover has a scheduler, see PlaybackScheduler.report()
+        """
+        steps, start_time = self._start_playback(trajectory)
+
+        async def process(indx, step):
+            x, y, flags = step
+            await maybe_await(move_func(x, y))
+            self._trace_step(indx, x, y, start_time)
+            if flags & Trajectory.CLICK:
+                self._trace_step(indx, x, y, start_time, flags)
+                await maybe_await(click_func(x, y))
+
+        report = None
+        with self.instrumentation.stage("playback"):
+            if self.scheduler is not None:
+                report = self.last_playback = await self.scheduler.play_async(steps, process)
+            else:
+                for indx, step in enumerate(steps):
+                    await process(indx, step)
+                    # Letting the other movers run
+                    await asyncio.sleep(0)
+        self._count_steps(len(steps), int(np.count_nonzero(trajectory.flags & Trajectory.FAKE)))
+
+        return report
+
+    def _start_playback(self, trajectory: Trajectory):
+        """
+        Reports the start position and splits the trajectory into steps
+        :return: list of (x, y, flags) steps and the playback start time, time.perf_counter() based
+        """
+        start_time = time.perf_counter()
+        if self.instrumentation.enabled:
+            self.instrumentation.event("move", number=-1, time=0., x=self.x, y=self.y)
+        return list(zip(*trajectory.xy.T.tolist(), trajectory.flags.tolist())), start_time
+
+    def _trace_step(self, indx: int, x, y, start_time: float, flags: int = None):
+        """
+        Reports a playback step: the move to the point, or the click at it if its flags are given.
+        Clicks flagged with Trajectory.FAKE are reported as fake ones
+        """
+        if self.instrumentation.enabled:
+            name = "move" if flags is None else "fake_click" if flags & Trajectory.FAKE else "click"
+            self.instrumentation.event(name, number=indx, time=time.perf_counter() - start_time, x=x, y=y)
+
+    def _plan_path(self, boxes, allow_fakes: bool, click_thershold: int, click_waypoints: bool):
+        """
+        Chooses the waypoints inside the boxes and builds the chained curves through them
+        :return: last waypoint x, y and Trajectory of the whole path, clipped by the screen size. Waypoints are flagged with
+        Trajectory.WAYPOINT, clicks (both waypoint and fake ones) with Trajectory.CLICK, fake ones with Trajectory.FAKE
+        as well
+        """
+        dests = [self._pick_destination(*box) for box in boxes]
+        if not dests:
+            raise ValueError("boxes must contain at least one box")
+        starts = [(self.x, self.y)] + dests[:-1]
+
+        min_points, max_points = self._points_limits
+        params = [self._curve_params(get_distance(*start, *dest), self.height, min_points, max_points, self._rng,
+                                     self.random_velocity) for start, dest in zip(starts, dests)]
+        for (dest_x, dest_y), param in zip(dests, params):
+            self.instrumentation.event("curve", x=dest_x, y=dest_y, target_points=param["target_points"])
+        points, offsets = HumanCurve.generate_batch(starts, dests, self._rng, chain=True,
+                                                    instrumentation=self.instrumentation,
+                                                    **{key: [param[key] for param in params] for key in params[0]})
+
+        legs = []
+        flags = []
+        for indx, (dest_x, dest_y) in enumerate(dests):
+            # Every leg but the first one starts at the previous waypoint, which is already there
+            leg = points[offsets[indx] + (indx > 0):offsets[indx + 1]]
+            # Adding target point so the algorithm won't skip it for sure
+            if not np.any((leg[:, 0] == dest_x) & (leg[:, 1] == dest_y)):
+                leg = np.append(leg, [[dest_x, dest_y]], axis=0)
+            leg = np.clip(leg, 0, [self.width - 1, self.height - 1])
+
+            leg_flags = self._fake_clicks(leg, dest_x, dest_y, allow_fakes, click_thershold) * \
+                (Trajectory.CLICK | Trajectory.FAKE)
+            leg_flags[-1] |= Trajectory.WAYPOINT
+            if click_waypoints:
+                # Waypoint click replaces a fake one at the same point
+                leg_flags[-1] = leg_flags[-1] & ~Trajectory.FAKE | Trajectory.CLICK
+            legs.append(leg)
+            flags.append(leg_flags)
+
+        points = np.concatenate(legs)
+        times = self.scheduler.timestamps(points.shape[0]) if self.scheduler is not None else None
+        return dests[-1][0], dests[-1][1], Trajectory(points, times, np.concatenate(flags))
+
+    def _count_steps(self, points_count: int, clicks_count: int):
+        """Reports the emitted points and fake clicks counters"""
+        if self.instrumentation.enabled:
+            self.instrumentation.count("points_emitted", points_count)
+            self.instrumentation.count("fake_clicks", clicks_count)
+
+    def _plan_move(self, top_left_x, top_left_y, bottom_right_x, bottom_right_y, allow_fakes: bool, click_thershold: int):
+        """
+        Chooses the destination point inside the box, builds the curve to it and decides where to fake-click
+        :return: destination x, y and Trajectory of the move, clipped by the screen size. Fake clicks are flagged
+        with Trajectory.CLICK and Trajectory.FAKE, the points are timestamped if the mover has a scheduler
+        """
+        dest_x, dest_y = self._pick_destination(top_left_x, top_left_y, bottom_right_x, bottom_right_y)
+
+        points = np.asarray(self._curve_to(dest_x, dest_y), dtype=np.float64).reshape(-1, 2)
+
+        # Adding target point so the algorithm won't skip it for sure
+        if not np.any((points[:, 0] == dest_x) & (points[:, 1] == dest_y)):
+            points = np.append(points, [[dest_x, dest_y]], axis=0)
+
+        points = np.clip(points, 0, [self.width - 1, self.height - 1])
+        clicks = self._fake_clicks(points, dest_x, dest_y, allow_fakes, click_thershold)
+        times = self.scheduler.timestamps(points.shape[0]) if self.scheduler is not None else None
+
+        return dest_x, dest_y, Trajectory(points, times, clicks * (Trajectory.CLICK | Trajectory.FAKE))
+
+    def _fake_clicks(self, points, dest_x, dest_y, allow_fakes: bool, click_thershold: int):
+        """
+        Fake clicks decision for the whole move at once, same as _fake_clicker() gives point by point
+        :return: (N,) bool array of the points to fake-click at
+        """
+        # Max fake clicks count
+        max_clicks = self._rng.choice(range(1, 4), p=[0.8, 0.15, 0.05])
+
+        clicks = np.zeros(points.shape[0], dtype=bool)
+        if allow_fakes:
+            # Points close enough to the destination, each one is clicked with 0.3 probability until max_clicks
+            near = np.flatnonzero(get_distance(points[:, 0], points[:, 1], dest_x, dest_y) <= click_thershold)
+            clicks[near[self._rng.random(near.shape[0]) < 0.3][:max_clicks]] = True
+        return clicks
+
+    def _pick_destination(self, top_left_x, top_left_y, bottom_right_x, bottom_right_y):
+        """Random destination point inside the box"""
+        dest_x = int(self._rng.integers(int(top_left_x) + 1, int(bottom_right_x) - 1))
+        dest_y = int(self._rng.integers(int(top_left_y) + 1, int(bottom_right_y) - 1))
+        return dest_x, dest_y
+
+    def _fake_clicker(self, allow_fakes: bool, click_thershold: int):
+        """
+        Fake clicks decision for a single move
+        :return: function of the point and the destination, telling whether to fake-click at the point
+        """
         # Actual clicks count
         click_count = 0
         # Max fake clicks count
-        max_clicks = random.choices(population=range(1, 4), weights=[0.8, 0.15, 0.05], k=1)[0]
+        max_clicks = self._rng.choice(range(1, 4), p=[0.8, 0.15, 0.05])
         # Distance where we allow fake clicks to happen
         distance_threshold = click_thershold
 
-        # Adding target point so the algorithm won't skip it for sure
-        if (dest_x, dest_y) not in res:
-            res.append((dest_x, dest_y))
-        # Points processing
-        start_time = datetime.now()
-        print(f"base_move - number:-1, time: {datetime.now() - start_time}, x:{self.x}, y:{self.y}")
-        for indx, point in enumerate(res):
-            tmp = float(np.clip(point[0], 0, self.width - 1)), float(np.clip(point[1], 0, self.height - 1))
-            move_func(tmp[0], tmp[1])
-            print(f"base_move - number:{indx}, time: {datetime.now() - start_time}, x:{tmp[0]}, y:{tmp[1]}")
-            if get_distance(tmp[0], tmp[1], dest_x, dest_y) <= distance_threshold \
-                    and click_count < max_clicks and allow_fakes:
-                is_allowed = random.choices(population=[False, True], weights=[0.7, 0.3], k=1)[0]
+        def is_fake_click(x, y, dest_x, dest_y):
+            nonlocal click_count
+            if get_distance(x, y, dest_x, dest_y) <= distance_threshold and click_count < max_clicks and allow_fakes:
+                is_allowed = self._rng.random() < 0.3
                 if is_allowed:
-                    print(f"fake click - number:{indx}, time: {datetime.now() - start_time}, x:{tmp[0]}, y:{tmp[1]}")
-                    click_func(tmp[0], tmp[1])
                     click_count += 1
+                    return True
+            return False
 
-        self.x = dest_x
-        self.y = dest_y
-
-        return
+        return is_fake_click
 
-    def mouse_move_test(self, top_left_x: int, top_left_y: int, bottom_right_x: int, bottom_right_y: int):
+    def mouse_move_test(self, top_left_x: int, top_left_y: int, bottom_right_x: int, bottom_right_y: int,
+                        path: str = None):
         """
-            Visualization method which uses OpenCV to draw the curves. No actual moving/clicking is performed. Screen size is locked by class attributes (default = (1800, 800))
+            Visualization method which draws the curves with render.Renderer. No actual moving/clicking is performed. Screen size is locked by class attributes (default = (1800, 800))
+            The curve is shown point by point with OpenCV, or written to the PNG file if the path is set (no display needed)
 
             :param top_left_x: top left corner of the bounding box
             :param top_left_y: top left corner of the bounding box
             :param bottom_right_x: bottom right corner of the bounding box
             :param bottom_right_y: bottom right corner of the bounding box
+            :param path: PNG file to write the curve to instead of showing it
 
             >>> # Usage example:
             >>> max_x = 1800
@@ -146,34 +699,24 @@ class MouseMover:
             >>>     mouse.mouse_move_test(tmp_x, tmp_y, tmp_x + 20, tmp_y + 20)
             >>>     time.sleep(2)
         """
-        self.screen = np.zeros(self.shape)
+        dest_x, dest_y = self._pick_destination(top_left_x, top_left_y, bottom_right_x, bottom_right_y)
 
-        seed_core = datetime.now().microsecond
-        seed(seed_core)
+        res = self._curve_to(dest_x, dest_y)
 
-        # Box center random point
-        dest_x = randrange(int(top_left_x) + 1, int(bottom_right_x) - 1)
-        dest_y = randrange(int(top_left_y) + 1, int(bottom_right_y) - 1)
+        renderer = Renderer(self.shape[1], self.shape[0])
+        if path is not None:
+            self.screen = renderer.draw(res, self.prev_screen.copy())
+            write_png(path, self.screen)
+        else:
+            import cv2 as cv
 
-        res = self._generate_curve(self.x, self.y, dest_x, dest_y, self.width, self.height,
-                                   self._min_points_scaled, self._max_points_scaled)
+            for self.screen in renderer.frames(res, canvas=self.prev_screen.copy()):
+                # OpenCV expects BGR
+                cv.imshow("Some curve", self.screen[..., ::-1])
+                cv.waitKey(2)
 
-        int_list = res
-
-        for i in int_list:
-            tmp = [int(np.clip(i[0], 0, self.shape[1] - 1)), int(np.clip(i[1], 0, self.shape[0] - 1))]
-
-            for j in range(-2, 3):
-                for k in range(-2, 3):
-                    self.screen[np.clip(tmp[1] + j, 0, self.shape[0] - 1)][np.clip(tmp[0] + k, 0, self.shape[1] - 1)] \
-                        = (255, 0, 207)
-
-            self.prev_screen *= 1/3
-            cv.imshow("Some curve", self.screen + self.prev_screen)
-            cv.waitKey(2)
-
-            # This line will make visualization a step-by-step animation, you will see only the most recent points
-            # self.prev_screen = self.screen
+        # This line will keep the curves on the screen, you will see all of them instead of the most recent one
+        # self.prev_screen = self.screen
 
         self.x = dest_x
         self.y = dest_y
@@ -181,37 +724,67 @@ class MouseMover:
         return
 
     @staticmethod
-    def _generate_curve(cur_x, cur_y, dest_x, dest_y, width: int, height: int, min_points: int, max_points: int):
+    def _generate_curve(cur_x, cur_y, dest_x, dest_y, width: int, height: int, min_points: int, max_points: int,
+                        rng: np.random.Generator, instrumentation: Instrumentation = DISABLED,
+                        random_velocity: bool = False):
         """
         Curve generation with a set of params
+        :param rng: generator used for all the random choices, including the curve ones
+        :param instrumentation: receiver of the curve event and the generation stages timings
+        :param random_velocity: use a random velocity profile instead of the default easing
         :return: Points for a target curve
         """
+        return MouseMover._human_curve(cur_x, cur_y, dest_x, dest_y, width, height, min_points, max_points,
+                                       rng, instrumentation, random_velocity).points
+
+    @staticmethod
+    def _human_curve(cur_x, cur_y, dest_x, dest_y, width: int, height: int, min_points: int, max_points: int,
+                     rng: np.random.Generator, instrumentation: Instrumentation = DISABLED,
+                     random_velocity: bool = False):
+        """
+        Same as _generate_curve(), but the curve itself is returned, its points are not evaluated yet
+        :return: HumanCurve
+        """
+        params = MouseMover._curve_params(get_distance(cur_x, cur_y, dest_x, dest_y), height, min_points, max_points, rng,
+                                          random_velocity)
+
+        instrumentation.event("curve", x=dest_x, y=dest_y, target_points=params["target_points"])
+
+        return HumanCurve((cur_x, cur_y), (dest_x, dest_y), rng=rng, instrumentation=instrumentation, **params)
+
+    @staticmethod
+    def _curve_params(distance, height: int, min_points: int, max_points: int, rng: np.random.Generator,
+                      random_velocity: bool = False):
+        """
+        Random curve params for a move of the given distance
+        :param random_velocity: add a random velocity profile as the tweening
+        :return: dict of HumanCurve keywords
+        """
         # This one for curve order regulation
-        knots_count = choices([1, 2, 3], k=1)[0]  # , 4, 5, 6, 7, 8, 9, 10
+        knots_count = int(rng.choice([1, 2, 3]))  # , 4, 5, 6, 7, 8, 9, 10
 
         # For total curve points density. USE FOR SPEED ADJUSTMENT
         # Truncating distance by view port height value
-        distance = get_distance(cur_x, cur_y, dest_x, dest_y, height)
+        distance = np.clip(distance, 0, height)
         # target_avg_points = 15 - experimental value (the default optimal one by now)
         # Possible points numbers, 20 aka max points, 5 aka min points
         max_range = range(min_points, max_points + 1)
         points_number = [num for num in max_range]
         # Scaling distance to points number range, applying random bias (-2 - +3 points per curve)
         target_points = int(distance / height * (points_number[-1] - points_number[0]) + points_number[0])
-        points_num_bias = random.choices(population=range(-2, 4), weights=[0.05, 0.15, 0.5, 0.15, 0.1, 0.05], k=1)[0]
+        points_num_bias = rng.choice(range(-2, 4), p=[0.05, 0.15, 0.5, 0.15, 0.1, 0.05])
         target_points = int(np.clip(target_points + points_num_bias, points_number[0], points_number[-1]))
 
-        print(dest_x, dest_y, target_points)
-
         # For noise regulation
-        distortion = randrange(5, 20) / 10.
-        # Curve itself. Since we use only a few points - interpolation step is set to half of the target points number
+        distortion = rng.integers(5, 20) / 10.
+        # Since we use only a few points - interpolation step is set to half of the target points number
         interp_step = target_points // 2 + 1
-        human_curve = HumanCurve((cur_x, cur_y), (dest_x, dest_y), knots_count=knots_count,
-                                 target_points=target_points, distortion_mean=distortion,
-                                 interp_step=interp_step)
 
-        return human_curve.points
+        params = {"knots_count": knots_count, "target_points": target_points, "distortion_mean": distortion,
+                  "interp_step": interp_step}
+        if random_velocity:
+            params["tweening"] = random_profile(rng)
+        return params
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+import time
+import asyncio
+import inspect
+import numpy as np
+
+
+async def maybe_await(result):
+    """Awaits the result of a call if it is awaitable, so both plain and coroutine functions may be used as callbacks"""
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+class PlaybackScheduler:
+    """
+    Plays the curve points back in real time. Each point gets a timestamp, points are emitted at the deadlines
+    measured from the move start with time.perf_counter, so lateness of a single point doesn't shift the rest of them.
+    \n
+    Points are evenly spaced in time, so the cursor velocity follows the tweening of the curve points
+    """
+    def __init__(self, duration: float = None, hz: float = None, spin_threshold: float = 0.002):
+        """
+        :param duration: total move duration in seconds
+        :param hz: points rate, used if no duration is set
+        :param spin_threshold: waiting time (seconds) for the busy loop to cover after sleeping. Sleep alone is imprecise,
+        spinning alone wastes CPU. Use 0 to sleep only
+        """
+        if (duration is None) == (hz is None):
+            raise ValueError("Exactly one of duration and hz must be set")
+        if (duration is not None and duration < 0) or (hz is not None and hz <= 0):
+            raise ValueError("duration must be non-negative and hz must be positive")
+        if spin_threshold < 0:
+            raise ValueError("spin_threshold must be non-negative")
+
+        self.duration = duration
+        self.hz = hz
+        self.spin_threshold = spin_threshold
+
+    def timestamps(self, points_count: int):
+        """
+        Returns the time offsets of the points from the move start, seconds
+        :return: float array of points_count values
+        """
+        if self.duration is not None:
+            return np.linspace(0., self.duration, points_count)
+        return np.arange(points_count) / self.hz
+
+    def interval(self, points_count: int):
+        """
+        Time between two consecutive points, seconds. Used when the points count is not known beforehand,
+        points_count is the expected one then
+        """
+        if self.duration is not None:
+            return self.duration / max(points_count - 1, 1)
+        return 1. / self.hz
+
+    def wait(self, deadline: float):
+        """Waits until time.perf_counter() reaches the deadline: sleeps most of the time and spins the rest"""
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_threshold:
+            time.sleep(remaining - self.spin_threshold)
+        while time.perf_counter() < deadline:
+            pass
+
+    def play(self, points, emit):
+        """
+        Calls emit(index, point) for every point at its deadline
+        :return: playback report, see report()
+        """
+        deadlines = time.perf_counter() + self.timestamps(len(points))
+        lateness = np.empty(len(points))
+        for indx, point in enumerate(points):
+            self.wait(deadlines[indx])
+            lateness[indx] = time.perf_counter() - deadlines[indx]
+            emit(indx, point)
+
+        return self.report(lateness, float(time.perf_counter() - deadlines[0]) if len(points) else 0.)
+
+    async def play_async(self, points, emit):
+        """
+        Same as play(), but awaits the deadlines instead of blocking. Never spins, so expect a bit more jitter.
+        emit may be either a plain or a coroutine function
+        :return: playback report, see report()
+        """
+        deadlines = time.perf_counter() + self.timestamps(len(points))
+        lateness = np.empty(len(points))
+        for indx, point in enumerate(points):
+            await asyncio.sleep(max(deadlines[indx] - time.perf_counter(), 0.))
+            lateness[indx] = time.perf_counter() - deadlines[indx]
+            await maybe_await(emit(indx, point))
+
+        return self.report(lateness, float(time.perf_counter() - deadlines[0]) if len(points) else 0.)
+
+    @staticmethod
+    def report(lateness, elapsed: float):
+        """
+        Playback summary: points count, actual duration and jitter (seconds the points were emitted after their deadlines)
+        :return: dict
+        """
+        if not len(lateness):
+            return {"points": 0, "duration": elapsed, "jitter_mean": 0., "jitter_p95": 0., "jitter_max": 0.}
+        return {"points": len(lateness), "duration": elapsed, "jitter_mean": float(np.mean(lateness)),
+                "jitter_p95": float(np.percentile(lateness, 95)), "jitter_max": float(np.max(lateness))}
@@ -0,0 +1,123 @@
+import threading
+from collections import deque
+import numpy as np
+from base_functions import to_unit_frame, from_unit_frame, direction_angle, angle_bucket, angle_buckets
+from trajectory import Trajectory
+
+
+class TrajectoryPrefetcher:
+    """
+    Keeps bounded queues of ready trajectories filled by background worker threads, one queue per distance
+    and direction bucket. Trajectories are generated along the bucket direction, stored in the unit frame
+    (start = (0, 0), end = (1, 0)) and moved onto the actual start and end points on request, so a queued curve fits
+    any move of a similar distance and direction. Directions are folded into a right angle, see direction_angle()
+    \n
+    Use hits and misses counters to size the pool: a miss means the caller has to generate the curve itself
+    """
+    def __init__(self, generate, buckets=None, queue_size: int = 8, workers: int = 1, rng=None, angles: int = 16):
+        """
+        :param generate: function taking a distance, an angle (radians) and a numpy.random.Generator and returning
+        the points of a curve from (0, 0) to distance * (cos(angle), sin(angle))
+        :param buckets: distances to prepare curves for. Moves are served by the closest bucket within
+        bucket_tolerance ratio. Default = powers of sqrt(2) from 16 to 4096 px
+        :param queue_size: max number of ready curves per bucket
+        :param workers: number of background threads
+        :param rng: numpy.random.Generator or a seed for a new one, used to seed the workers generators on every start
+        :param angles: number of direction buckets splitting the right angle evenly. Curves are generated
+        along the middle direction of a bucket
+        """
+        if queue_size < 1 or workers < 1 or angles < 1:
+            raise ValueError("queue_size, workers and angles must be positive integers")
+
+        self._generate = generate
+        self.buckets = np.sort(np.asarray(buckets if buckets is not None else 2 ** np.arange(4, 12.5, 0.5),
+                                          dtype=np.float64))
+        self.bucket_tolerance = 2 ** 0.25
+        self.angles = angle_buckets(angles)
+        self.queue_size = queue_size
+        # Queue of the distance bucket i and the direction bucket j is i * angles + j
+        self._queues = [deque() for _ in range(self.buckets.shape[0] * angles)]
+
+        self.workers = workers
+        self._rng = np.random.default_rng(rng)
+        self._threads = []
+        self._lock = threading.Condition()
+        self._running = False
+
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """Starts the workers. Queues are being filled from now on. May be called again after stop()"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            # Threads can't be restarted, so every start gets new ones
+            seeds = self._rng.integers(0, 2 ** 63, size=self.workers)
+            self._threads = [threading.Thread(target=self._work, args=(np.random.default_rng(seed),), daemon=True)
+                             for seed in seeds]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stops the workers and waits for them. Ready curves stay available"""
+        with self._lock:
+            self._running = False
+            self._lock.notify_all()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join()
+
+    @property
+    def stats(self):
+        """Hit / miss counters and the number of ready curves"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "ready": sum(len(queue) for queue in self._queues)}
+
+    def get(self, start, end):
+        """
+        Takes a ready curve of the closest distance bucket and moves it onto the given points
+        :return: Trajectory or None if there is no suitable curve ready
+        """
+        distance = np.hypot(end[0] - start[0], end[1] - start[1])
+        bucket = self._bucket(distance, direction_angle(start, end))
+        with self._lock:
+            if bucket is None or not self._queues[bucket]:
+                self.misses += 1
+                return None
+            points = self._queues[bucket].popleft()
+            self.hits += 1
+            self._lock.notify()
+
+        return Trajectory(from_unit_frame(points, start, end))
+
+    def _bucket(self, distance, angle):
+        """Returns index of the queue of the closest buckets or None if the distance is too far from any of them"""
+        if distance <= 0:
+            return None
+        indx = int(np.abs(np.log(self.buckets / distance)).argmin())
+        ratio = max(self.buckets[indx] / distance, distance / self.buckets[indx])
+        return indx * self.angles.shape[0] + int(angle_bucket(angle, self.angles.shape[0])) \
+            if ratio <= self.bucket_tolerance else None
+
+    def _work(self, rng):
+        """Worker loop: refills the emptiest bucket, sleeps while all of them are full"""
+        while True:
+            with self._lock:
+                while self._running and min(map(len, self._queues)) >= self.queue_size:
+                    self._lock.wait()
+                if not self._running:
+                    return
+                bucket = int(np.argmin([len(queue) for queue in self._queues]))
+
+            distance_indx, angle_indx = divmod(bucket, self.angles.shape[0])
+            distance, angle = self.buckets[distance_indx], self.angles[angle_indx]
+            end = (distance * np.cos(angle), distance * np.sin(angle))
+            # Queued compactly, float32 precision is plenty for the unit frame
+            points = Trajectory(to_unit_frame(np.asarray(self._generate(distance, angle, rng), dtype=np.float64),
+                                              (0, 0), end))
+
+            with self._lock:
+                if len(self._queues[bucket]) < self.queue_size:
+                    self._queues[bucket].append(points)
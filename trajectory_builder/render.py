@@ -0,0 +1,291 @@
+"""
+Headless rendering of the trajectories into uint8 RGB buffers. No display and no OpenCV needed,
+PNG files are encoded with zlib.
+
+Usage:
+    python render.py --count 10000 --sheet sheet.png --heatmap heatmap.png
+
+Points are passed as a (N, 2) array of x, y pairs. Batches are packed the same way as HumanCurve.generate_batch()
+returns them: all the points in one array plus offsets, points of the i-th curve are points[offsets[i]:offsets[i + 1]]
+"""
+import zlib
+import struct
+import argparse
+import numpy as np
+from base_functions import as_points
+
+
+# Same color as OpenCV visualization had (BGR 255, 0, 207)
+DEFAULT_COLOR = (207, 0, 255)
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Points drawn at once, keeps the memory bounded for huge batches
+BLOCK_POINTS = 1 << 12
+
+
+def pack_curves(curves):
+    """
+    Packs a list of curves into one array of points and offsets
+    :param curves: sequence of (N_i, 2) array-likes
+    :return: tuple of (P, 2) float array and (B + 1) int array of offsets
+    """
+    curves = [as_points(curve) for curve in curves]
+    offsets = np.concatenate(([0], np.cumsum([curve.shape[0] for curve in curves]))).astype(np.int64)
+    points = np.concatenate(curves) if curves else np.empty((0, 2))
+    return points, offsets
+
+
+def encode_png(image, level: int = 6):
+    """
+    Encodes an image as PNG
+    :param image: (H, W) grayscale or (H, W, 3) RGB uint8 array
+    :param level: zlib compression level, lower is faster
+    :return: bytes
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    if image.ndim not in (2, 3) or (image.ndim == 3 and image.shape[2] != 3):
+        raise ValueError("image must be either (H, W) or (H, W, 3) array")
+    height, width = image.shape[:2]
+
+    # Every row is prefixed by its filter type, 0 = none
+    raw = np.zeros((height, 1 + image[0].size), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2 if image.ndim == 3 else 0, 0, 0, 0)
+    return PNG_SIGNATURE + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw.tobytes(), level)) + \
+        chunk(b"IEND", b"")
+
+
+def write_png(path: str, image, level: int = 6):
+    """Writes an image to the PNG file, see encode_png()"""
+    with open(path, "wb") as file:
+        file.write(encode_png(image, level))
+
+
+class Renderer:
+    """
+    Draws the trajectories on a canvas of the screen size. Every point is stamped as a square of point_size pixels,
+    all the points are drawn at once with numpy indexing
+    """
+    def __init__(self, width: int, height: int, point_size: int = 5, color=DEFAULT_COLOR, background=(0, 0, 0)):
+        """
+        :param width: canvas width
+        :param height: canvas height
+        :param point_size: side of the square stamped for each point, px
+        :param color: RGB points color
+        :param background: RGB canvas color
+        """
+        if width < 1 or height < 1 or point_size < 1:
+            raise ValueError("width, height and point_size must be positive")
+        self.width = int(width)
+        self.height = int(height)
+        self.color = np.asarray(color, dtype=np.uint8)
+        self.background = np.asarray(background, dtype=np.uint8)
+
+        # Offsets of the stamp pixels from the point
+        radius = np.arange(point_size) - (point_size - 1) // 2
+        self._stamp = np.stack(np.meshgrid(radius, radius), axis=-1).reshape(-1, 2)
+
+    def canvas(self, width: int = None, height: int = None):
+        """New canvas filled with the background, the renderer size by default"""
+        canvas = np.empty((height or self.height, width or self.width, 3), dtype=np.uint8)
+        canvas[:] = self.background
+        return canvas
+
+    @staticmethod
+    def _pixels(points, width: int, height: int, stamp=None):
+        """Flat indices of the pixels covered by the points (and their stamps), clipped by the canvas"""
+        pixels = np.rint(points).astype(np.int64)
+        if stamp is not None:
+            pixels = (pixels[:, None, :] + stamp).reshape(-1, 2)
+        x = np.clip(pixels[:, 0], 0, width - 1)
+        y = np.clip(pixels[:, 1], 0, height - 1)
+        return y * width + x
+
+    @staticmethod
+    def _cells(points, cell: int, width: int, height: int):
+        """Flat indices of the grid cells containing the points, clipped by the grid of width x height cells"""
+        cells = np.floor(points / cell).astype(np.int64)
+        x = np.clip(cells[:, 0], 0, width - 1)
+        y = np.clip(cells[:, 1], 0, height - 1)
+        return y * width + x
+
+    @staticmethod
+    def _segments(points, offsets=None):
+        """
+        Points along the lines between the consecutive points of each curve, one per pixel
+        :return: (M, 2) float array
+        """
+        if points.shape[0] < 2:
+            return points
+        delta = np.diff(points, axis=0)
+        steps = np.ceil(np.abs(delta).max(axis=1)).astype(np.int64)
+        if offsets is not None:
+            # No lines between the last point of a curve and the first one of the next curve
+            ends = offsets[1:-1] - 1
+            steps[ends[(ends >= 0) & (ends < steps.shape[0])]] = 0
+        steps = np.maximum(steps, 1)
+
+        segment = np.repeat(np.arange(delta.shape[0]), steps)
+        starts = np.concatenate(([0], np.cumsum(steps)[:-1]))
+        ratio = (np.arange(segment.shape[0]) - starts[segment]) / steps[segment]
+        return np.concatenate((points[segment] + delta[segment] * ratio[:, None], points[-1:]))
+
+    def draw(self, points, canvas=None, offsets=None, color=None, lines: bool = False):
+        """
+        Draws the points on the canvas
+        :param points: (N, 2) array-like of x, y
+        :param canvas: canvas to draw on, modified in place. Default = new one
+        :param offsets: curves offsets of packed points, used with lines only. Default = all the points are one curve
+        :param color: RGB color. Default = renderer one
+        :param lines: connect consecutive points with 1 px lines
+        :return: canvas
+        """
+        if canvas is None:
+            canvas = self.canvas()
+        self._fill(canvas, as_points(points), offsets, self.color if color is None else color, lines, self._stamp)
+        return canvas
+
+    @staticmethod
+    def _fill(canvas, points, offsets, color, lines: bool, stamp=None):
+        """Draws the points block by block, see draw()"""
+        height, width = canvas.shape[:2]
+        flat = canvas.reshape(-1, 3)
+        total = points.shape[0]
+        offsets = None if offsets is None else np.asarray(offsets, dtype=np.int64)
+        for first in range(0, total, BLOCK_POINTS):
+            last = min(first + BLOCK_POINTS, total)
+            if lines:
+                # One more point to connect the blocks, offsets are local ones
+                block_offsets = None if offsets is None else np.clip(offsets - first, 0, last + 1 - first)
+                flat[Renderer._pixels(Renderer._segments(points[first:last + 1], block_offsets), width, height)] = color
+            flat[Renderer._pixels(points[first:last], width, height, stamp)] = color
+
+    def heatmap(self, points, cell: int = 1, gamma: float = 0.5):
+        """
+        Point density map: count of points per cell, normalized by the max count
+        :param points: (N, 2) array-like of x, y, usually packed points of a lot of curves
+        :param cell: cell side, px
+        :param gamma: brightness curve applied to the normalized density, < 1 makes sparse cells visible
+        :return: (H, W, 3) uint8 array of the renderer size, densities are drawn in the renderer color
+        """
+        points = as_points(points)
+        width, height = -(-self.width // cell), -(-self.height // cell)
+        counts = np.bincount(self._cells(points, cell, width, height), minlength=width * height)
+        density = (counts / max(counts.max(initial=0), 1)) ** gamma
+        density = np.repeat(np.repeat(density.reshape(height, width), cell, axis=0), cell, axis=1)
+        density = density[:self.height, :self.width, None]
+
+        # Blending the background and the color
+        canvas = self.background + (self.color.astype(np.float64) - self.background) * density
+        return np.rint(canvas).astype(np.uint8)
+
+    def frames(self, points, decay: float = None, canvas=None):
+        """
+        Animation of the points drawing, a frame per point
+        :param points: (N, 2) array-like of x, y
+        :param decay: fading of the previous points per frame, e.g. 1/3. Default = no fading, points are accumulated
+        :param canvas: initial canvas, modified in place. Default = new one
+        :return: generator of (H, W, 3) uint8 frames. The same buffer is yielded each time, copy it to keep the frame
+        """
+        points = as_points(points)
+        if canvas is None:
+            canvas = self.canvas()
+        height, width = canvas.shape[:2]
+        flat = canvas.reshape(-1, 3)
+        for point in points:
+            if decay is not None:
+                np.multiply(canvas, decay, out=canvas, casting="unsafe")
+            flat[self._pixels(point[None], width, height, self._stamp)] = self.color
+            yield canvas
+
+    def write_frames(self, pattern: str, points, decay: float = None):
+        """
+        Writes the animation frames to PNG files
+        :param pattern: file name pattern with a placeholder for the frame number, e.g. "frame_{:04d}.png"
+        :return: number of frames written
+        """
+        count = 0
+        for count, frame in enumerate(self.frames(points, decay), 1):
+            write_png(pattern.format(count - 1), frame)
+        return count
+
+    def contact_sheet(self, points, offsets, columns: int = 10, cell_width: int = 180, cell_height: int = 80,
+                      fit: bool = False, lines: bool = False, border: int = 1):
+        """
+        Draws every curve in its own cell of a grid
+        :param points: packed points of the curves
+        :param offsets: curves offsets
+        :param columns: grid columns count
+        :param cell_width, cell_height: cell size, px
+        :param fit: scale each curve to fill its cell. Default = the whole screen is scaled to the cell
+        :param lines: connect consecutive points with lines
+        :param border: grid lines width, px
+        :return: (H, W, 3) uint8 array
+        """
+        points = as_points(points)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        size = offsets.shape[0] - 1
+        rows = max(-(-size // columns), 1)
+        lengths = np.diff(offsets)
+        curve_indx = np.repeat(np.arange(size), lengths)
+
+        inner = np.array([cell_width - 2 * border, cell_height - 2 * border], dtype=np.float64) - 1
+        if fit:
+            starts = offsets[:-1][lengths > 0]
+            low = np.full((size, 2), 0.)
+            high = np.full((size, 2), 1.)
+            low[lengths > 0] = np.minimum.reduceat(points, starts)
+            high[lengths > 0] = np.maximum.reduceat(points, starts)
+            scale = (inner / np.maximum(high - low, 1.)).min(axis=1)
+            local = (points - low[curve_indx]) * scale[curve_indx, None]
+        else:
+            local = points * (inner / [self.width - 1, self.height - 1]).min()
+
+        origin = np.stack((curve_indx % columns * cell_width, curve_indx // columns * cell_height), axis=1) + border
+        local = np.minimum(np.maximum(local, 0), inner) + origin
+
+        sheet = self.canvas(columns * cell_width, rows * cell_height)
+        if border:
+            gray = (self.color.astype(np.uint16) + self.background) // 4
+            for edge in range(border):
+                sheet[edge::cell_height] = gray
+                sheet[cell_height - 1 - edge::cell_height] = gray
+                sheet[:, edge::cell_width] = gray
+                sheet[:, cell_width - 1 - edge::cell_width] = gray
+
+        # Points are drawn as single pixels, stamps would spill over the cells at small scales
+        self._fill(sheet, local, offsets, self.color, lines)
+        return sheet
+
+
+if __name__ == "__main__":
+    from trajectory import HumanCurve
+
+    parser = argparse.ArgumentParser(description="Renders random curves into PNG files")
+    parser.add_argument("--count", type=int, default=100, help="number of curves")
+    parser.add_argument("--width", type=int, default=1800, help="screen width")
+    parser.add_argument("--height", type=int, default=800, help="screen height")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--columns", type=int, default=10, help="contact sheet columns")
+    parser.add_argument("--sheet", help="contact sheet file")
+    parser.add_argument("--heatmap", help="points density file")
+    parser.add_argument("--overlay", help="all the curves on one screen file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    size = (args.count, 2)
+    starts = rng.uniform(0, (args.width, args.height), size=size)
+    ends = rng.uniform(0, (args.width, args.height), size=size)
+    curves, curves_offsets = HumanCurve.generate_batch(starts, ends, rng, knots_count=rng.integers(1, 4, args.count),
+                                                       target_points=rng.integers(30, 121, args.count))
+
+    renderer = Renderer(args.width, args.height)
+    if args.sheet:
+        write_png(args.sheet, renderer.contact_sheet(curves, curves_offsets, args.columns, fit=True, lines=True))
+    if args.heatmap:
+        write_png(args.heatmap, renderer.heatmap(curves, cell=4))
+    if args.overlay:
+        write_png(args.overlay, renderer.draw(curves, offsets=curves_offsets, lines=True))
@@ -0,0 +1,145 @@
+import struct
+import numpy as np
+from trajectory import HumanCurve
+from base_functions import to_unit_frame, from_unit_frame, broadcast_param, direction_angle, angle_bucket, \
+    angle_buckets
+
+
+# File layout: header, index (one record per template), points of all the templates (float32 x, y pairs).
+# Header holds the templates count, the points count and the direction buckets count
+MAGIC = b"HLMT"
+VERSION = 2
+HEADER = struct.Struct("<4sIIQI")
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4"), ("distance", "<f4"), ("curvature", "<f4"),
+                        ("knots", "<u2"), ("bucket", "<i2"), ("angle", "u1")])
+
+# Distance buckets are spaced geometrically, this many per distance doubling
+BUCKETS_PER_OCTAVE = 4
+# Default template distances, px: from 8 up to 4096
+DEFAULT_DISTANCES = 2 ** np.arange(3, 12 + 1 / BUCKETS_PER_OCTAVE, 1 / BUCKETS_PER_OCTAVE)
+# Direction buckets in a right angle. Curves of the same distance but different directions are not alike,
+# see direction_angle()
+ANGLE_BUCKETS = 16
+
+
+def distance_bucket(distance):
+    """Index of the distance bucket, works for arrays as well"""
+    return np.rint(np.log2(np.maximum(distance, 1)) * BUCKETS_PER_OCTAVE).astype(np.int64)
+
+
+class TemplateLibrary:
+    """
+    Library of pregenerated curves stored in the unit frame (start = (0, 0), end = (1, 0)) in a compact binary file.
+    The file is memory-mapped read-only, so worker processes using the same library share its pages.
+    \n
+    Templates are indexed by distance bucket, direction bucket, knots count and curvature (max deviation from
+    the straight line in the unit frame). A lookup picks a random template of the closest distance bucket
+    and the same direction bucket and moves it onto the actual points
+    """
+    def __init__(self, path: str):
+        """
+        Opens the library file built with build()
+        :param path: library file path
+        """
+        with open(path, "rb") as library:
+            magic, version, count, points_count, angles = HEADER.unpack(library.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a curve template library of version {VERSION}")
+
+        self.path = path
+        self.angles = angles
+        self.index = np.memmap(path, dtype=INDEX_DTYPE, mode="r", offset=HEADER.size, shape=(count,)) if count \
+            else np.empty(0, dtype=INDEX_DTYPE)
+        self.points = np.memmap(path, dtype="<f4", mode="r", offset=HEADER.size + count * INDEX_DTYPE.itemsize,
+                                shape=(points_count, 2)) if points_count else np.empty((0, 2), dtype="<f4")
+
+        # Templates ids sorted by bucket, so a bucket is a contiguous range of them
+        self._order = np.argsort(self.index["bucket"], kind="stable")
+        self._buckets, self._bucket_first = np.unique(self.index["bucket"][self._order], return_index=True)
+        self._bucket_last = np.append(self._bucket_first[1:], count)
+
+    def __len__(self):
+        return self.index.shape[0]
+
+    @staticmethod
+    def build(path: str, distances=DEFAULT_DISTANCES, per_distance: int = 16, rng=None, angles: int = ANGLE_BUCKETS,
+              **kwargs):
+        """
+        Generates the templates and writes the library file. Templates of a direction bucket are generated
+        along its middle direction
+
+        :param path: library file path
+        :param distances: distances to generate the templates for, px
+        :param per_distance: number of templates per distance in every direction bucket
+        :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
+        :param angles: number of direction buckets in a right angle
+        :param kwargs: HumanCurve keywords, single values or sequences with a value per template
+        (templates are ordered by distance, then by direction bucket, per_distance templates each)
+        :return: number of templates written
+        """
+        if not 0 < angles < 256:
+            raise ValueError("angles must be in range [1, 255]")
+        distances = np.asarray(distances, dtype=np.float64)
+        directions = np.tile(np.repeat(np.arange(angles), per_distance), distances.shape[0])
+        distances = np.repeat(distances, angles * per_distance)
+        count = distances.shape[0]
+        directions_angles = angle_buckets(angles)[directions]
+        ends = np.stack((distances * np.cos(directions_angles), distances * np.sin(directions_angles)), axis=1)
+        points, offsets = HumanCurve.generate_batch(np.zeros((count, 2)), ends, rng=rng, **kwargs)
+
+        index = np.zeros(count, dtype=INDEX_DTYPE)
+        unit_points = np.empty((points.shape[0], 2), dtype="<f4")
+        for i in range(count):
+            unit_points[offsets[i]:offsets[i + 1]] = to_unit_frame(points[offsets[i]:offsets[i + 1]], (0, 0), ends[i])
+        # Max deviation from the straight line, share of the distance
+        deviation = np.abs(unit_points[:, 1])
+        peak = np.maximum.reduceat(deviation, offsets[:-1]) if count else deviation
+
+        index["offset"] = offsets[:-1]
+        index["length"] = np.diff(offsets)
+        index["distance"] = distances
+        index["curvature"] = peak
+        index["knots"] = broadcast_param(kwargs.get("knots_count", 2), count, np.int64)
+        index["bucket"] = distance_bucket(distances)
+        index["angle"] = directions
+
+        with open(path, "wb") as library:
+            library.write(HEADER.pack(MAGIC, VERSION, count, unit_points.shape[0], angles))
+            library.write(index.tobytes())
+            library.write(unit_points.tobytes())
+        return count
+
+    def template(self, template_id: int):
+        """Unit frame points of the template, a view of the mapped file"""
+        record = self.index[template_id]
+        return self.points[record["offset"]:record["offset"] + record["length"]]
+
+    def sample(self, start, end, rng=None, knots_count: int = None, max_curvature: float = None):
+        """
+        Picks a random template of the distance bucket closest to the start-end distance
+        (one bucket away at most) and of the start-end direction bucket and moves it onto the given points
+
+        :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
+        :param knots_count: use the templates of this knots count only
+        :param max_curvature: use the templates deviating from the straight line by this share of distance at most
+        :return: (N, 2) float array or None if there is no suitable template
+        """
+        if not len(self):
+            return None
+        bucket = int(distance_bucket(np.hypot(end[0] - start[0], end[1] - start[1])))
+        position = int(np.abs(self._buckets - bucket).argmin())
+        if abs(int(self._buckets[position]) - bucket) > 1:
+            return None
+
+        candidates = self._order[self._bucket_first[position]:self._bucket_last[position]]
+        direction = angle_bucket(direction_angle(start, end), self.angles)
+        candidates = candidates[self.index["angle"][candidates] == direction]
+        if knots_count is not None:
+            candidates = candidates[self.index["knots"][candidates] == knots_count]
+        if max_curvature is not None:
+            candidates = candidates[self.index["curvature"][candidates] <= max_curvature]
+        if not candidates.shape[0]:
+            return None
+
+        template_id = candidates[np.random.default_rng(rng).integers(candidates.shape[0])]
+        return from_unit_frame(self.template(template_id), start, end)
@@ -0,0 +1,33 @@
+import numpy as np
+from backends import build_events, CallbackBackend, RecordingBackend, MOVE, CLICK
+
+
+def test_build_events_order():
+    points = np.array([(1., 2.), (3., 4.), (5., 6.), (7., 8.)])
+    clicks = np.array([False, True, True, False])
+    times = np.array([10., 11., 12., 13.])
+    events, moves = build_events(points, clicks, times)
+
+    np.testing.assert_array_equal(moves, [0, 1, 3, 5])
+    np.testing.assert_array_equal(events["kind"], [MOVE, MOVE, CLICK, MOVE, CLICK, MOVE])
+    np.testing.assert_array_equal(events["x"], [1., 3., 3., 5., 5., 7.])
+    np.testing.assert_array_equal(events["y"], [2., 4., 4., 6., 6., 8.])
+    np.testing.assert_array_equal(events["time"], [10., 11., 11., 12., 12., 13.])
+
+
+def test_backends_receive_the_events():
+    points = np.array([(1., 2.), (3., 4.), (5., 6.)])
+    events, _ = build_events(points, np.array([False, True, False]))
+    calls = []
+    callback = CallbackBackend(lambda x, y: calls.append(("move", x, y)), lambda x, y: calls.append(("click", x, y)))
+    recording = RecordingBackend()
+    for chunk in (events[:2], events[2:]):
+        callback.send(chunk)
+        recording.send(chunk)
+
+    assert calls == [("move", 1., 2.), ("move", 3., 4.), ("click", 3., 4.), ("move", 5., 6.)]
+    assert len(recording) == 4
+    np.testing.assert_array_equal(recording.moves(), points)
+    np.testing.assert_array_equal(recording.clicks(), [(3., 4.)])
+    recording.clear()
+    assert len(recording) == 0 and recording.events.shape == (0,)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from base_functions import BezierCurve, DE_CASTELJAU_DEGREE
+
+
+def legacy_points(t, points):
+    bern = BezierCurve.bernstein_polynomial(points)
+    return np.array([bern(val) for val in t])
+
+
+@pytest.mark.parametrize("degree", [1, 2, 3, 7, DE_CASTELJAU_DEGREE - 1, DE_CASTELJAU_DEGREE + 6])
+def test_points_at_matches_bernstein_polynomial(degree):
+    rng = np.random.default_rng(degree)
+    points = rng.uniform(0., 1000., size=(degree + 1, 2))
+    t = np.concatenate(([0., 1.], rng.random(50)))
+
+    np.testing.assert_allclose(BezierCurve.points_at(t, points), legacy_points(t, points.tolist()),
+                               rtol=1e-9, atol=1e-6)
+
+
+def test_points_at_per_parameter_control_points():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0., 1000., size=(20, 4, 2))
+    t = rng.random(20)
+
+    expected = np.array([legacy_points([val], curve)[0] for val, curve in zip(t, points)])
+    np.testing.assert_allclose(BezierCurve.points_at(t, points), expected, rtol=1e-9, atol=1e-6)
+
+
+def test_curve_points_ends():
+    points = [(10., 20.), (300., -50.), (500., 400.)]
+    curve = BezierCurve.curve_points(100, points)
+
+    assert curve.shape == (100, 2)
+    np.testing.assert_allclose(curve[[0, -1]], [points[0], points[-1]])
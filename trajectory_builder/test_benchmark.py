@@ -0,0 +1,23 @@
+from benchmark import compare
+
+
+def run_results(**cases):
+    return {"results": {name: {"wall": wall, "peak_memory": memory} for name, (wall, memory) in cases.items()}}
+
+
+def test_compare_flags_wall_and_memory():
+    baseline = run_results(steady=(1e-3, 1000), slower=(1e-3, 1000), bigger=(1e-3, 1000), removed=(1e-3, 1000))
+    results = run_results(steady=(1.1e-3, 1050), slower=(1.5e-3, 1000), bigger=(1e-3, 1500), added=(1e-3, 1000))
+
+    regressions = compare(results, baseline, tolerance=0.2, memory_tolerance=0.1)
+
+    assert [(name, metric) for name, metric, *_ in regressions] == [("slower", "wall"), ("bigger", "peak_memory")]
+    assert regressions[1][2:] == (1000, 1500, 1.5)
+
+
+def test_compare_memory_tolerance_defaults_to_wall_one():
+    baseline = run_results(case=(1e-3, 1000))
+    results = run_results(case=(1e-3, 1150))
+
+    assert compare(results, baseline, tolerance=0.2) == []
+    assert len(compare(results, baseline, tolerance=0.1)) == 1
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import pytweening
+from easing import ease, easing_table, get_easing, Piecewise, random_profile
+
+
+def velocities(profile, at, eps: float = 1e-3):
+    """Slopes of the profile right before and right after the given progress values"""
+    at = np.asarray(at)
+    return ((profile.evaluate(at) - profile.evaluate(at - eps)) / eps,
+            (profile.evaluate(at + eps) - profile.evaluate(at)) / eps)
+
+
+def test_ease_matches_the_function():
+    progress = np.linspace(0., 1., 333)
+    expected = [pytweening.easeInOutCubic(val) for val in progress]
+
+    np.testing.assert_allclose(ease(pytweening.easeInOutCubic, progress), expected, atol=1e-5)
+    assert easing_table(pytweening.easeOutQuad, 64) is easing_table(pytweening.easeOutQuad, 64)
+    assert get_easing("easeOutQuad") is pytweening.easeOutQuad
+    with pytest.raises(ValueError):
+        get_easing("sleep")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_profile_ends_and_velocity(seed):
+    profile = random_profile(seed, burst_probability=0.)
+    progress = np.linspace(0., 1., 2001)
+    values = profile.evaluate(progress)
+
+    assert values[0] == 0. and values[-1] == pytest.approx(1., abs=1e-12)
+    assert profile(1.) == pytest.approx(1., abs=1e-12)
+    assert np.all(np.diff(values) >= 0)
+    # No bursts: the velocity is continuous where the parts join
+    before, after = velocities(profile, profile._time[1:-1])
+    np.testing.assert_allclose(after, before, rtol=0.02)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_profile_burst(seed):
+    profile = random_profile(seed, burst_probability=1.)
+    before, after = velocities(profile, profile._time[1:-1])
+
+    assert profile.evaluate([0., 1.]).tolist() == pytest.approx([0., 1.], abs=1e-12)
+    # Acceleration and slowdown joins stay smooth, cruise velocity changes at the burst only
+    np.testing.assert_allclose(after[[0, 2]], before[[0, 2]], rtol=0.02)
+    assert 0.6 <= after[1] / before[1] <= 1.6
+
+
+def test_piecewise_is_hashable_by_parts():
+    parts = ((pytweening.easeInQuad, 0.3, 0.2), (pytweening.linear, 0.7, 0.8))
+
+    assert Piecewise(parts) == Piecewise(parts) and hash(Piecewise(parts)) == hash(Piecewise(parts))
+    assert easing_table(Piecewise(parts), 32) is easing_table(Piecewise(parts), 32)
+    with pytest.raises(ValueError):
+        Piecewise(((pytweening.linear, 0., 1.),))
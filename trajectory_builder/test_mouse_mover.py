@@ -0,0 +1,160 @@
+import asyncio
+import numpy as np
+import pytest
+from backends import RecordingBackend, EVENT_DTYPE, MOVE, CLICK
+from playback import PlaybackScheduler
+from instrumentation import Instrumentation, CallbackSink, HistogramSink
+from trajectory import Trajectory
+from mouse_mover import MouseMover
+
+
+BOXES = ((1500, 800, 1510, 810), (300, 200, 340, 240), (900, 900, 905, 905))
+
+
+def record(seed, boxes=BOXES):
+    mover = MouseMover(1920, 1080, x=100, y=100, seed=seed, scheduler=PlaybackScheduler(duration=0.))
+    backend = RecordingBackend()
+    for box in boxes:
+        mover.mouse_move_batched(backend, *box, allow_fakes=True, click_thershold=50)
+    return backend.moves(), backend.clicks()
+
+
+def traced_mover(seed):
+    """Mover with its per-point events and counters recorded"""
+    events = []
+    histogram = HistogramSink()
+    sink = CallbackSink(on_event=lambda name, fields: events.append((name, fields["number"], fields["x"], fields["y"]))
+                        if name in ("move", "click", "fake_click") else None)
+    mover = MouseMover(1920, 1080, x=100, y=100, seed=seed, scheduler=PlaybackScheduler(duration=0.),
+                       instrumentation=Instrumentation(sink, histogram))
+    return mover, events, histogram
+
+
+def test_seed_reproducibility():
+    moves, clicks = record(11)
+    same_moves, same_clicks = record(11)
+    other_moves, _ = record(12)
+
+    np.testing.assert_array_equal(moves, same_moves)
+    np.testing.assert_array_equal(clicks, same_clicks)
+    assert moves.shape != other_moves.shape or not np.array_equal(moves, other_moves)
+
+
+def test_global_random_state_untouched():
+    np.random.seed(0)
+    state = np.random.get_state()[1].copy()
+    record(None)
+
+    np.testing.assert_array_equal(np.random.get_state()[1], state)
+
+
+def test_batched_deadlines():
+    duration = 0.05
+    mover = MouseMover(1920, 1080, x=100, y=100, seed=3, scheduler=PlaybackScheduler(duration=duration))
+    backend = RecordingBackend()
+    mover.mouse_move_batched(backend, 1500, 800, 1510, 810, allow_fakes=True, click_thershold=50, chunk_size=8)
+
+    events = backend.events
+    assert events.dtype == EVENT_DTYPE
+    assert events["time"].dtype == np.float64
+    assert len(backend.chunks) > 1
+
+    moves = events[events["kind"] == MOVE]
+    # Deadlines are evenly spaced over the duration, with no float32 rounding of the absolute times
+    np.testing.assert_allclose(np.diff(moves["time"]), duration / (moves.shape[0] - 1), rtol=0., atol=1e-7)
+    assert moves["time"][-1] - moves["time"][0] == pytest.approx(duration, abs=1e-7)
+    # Clicks share the deadline of their point
+    clicks = np.flatnonzero(events["kind"] == CLICK)
+    np.testing.assert_array_equal(events["time"][clicks], events["time"][clicks - 1])
+
+
+def test_async_playback_matches_sync():
+    sync_mover, sync_events, sync_histogram = traced_mover(5)
+    async_mover, async_events, async_histogram = traced_mover(5)
+    sync_clicks, async_clicks = [], []
+
+    async def coroutine_click(x, y):
+        async_clicks.append((x, y))
+
+    for box in BOXES:
+        sync_mover.mouse_move(lambda x, y: None, lambda x, y: sync_clicks.append((x, y)), *box,
+                              allow_fakes=True, click_thershold=50)
+        asyncio.run(async_mover.mouse_move_async(lambda x, y: None, coroutine_click, *box,
+                                                 allow_fakes=True, click_thershold=50))
+
+    assert sync_clicks and async_clicks == sync_clicks
+    assert async_events == sync_events
+    assert [event[1] for event in sync_events if event[0] == "move"].count(-1) == len(BOXES)
+    assert async_histogram.summary()["counters"] == sync_histogram.summary()["counters"]
+    assert sync_histogram.summary()["counters"]["fake_clicks"] == len(sync_clicks)
+
+
+def test_stream_retarget():
+    mover = MouseMover(1920, 1080, x=100, y=100, seed=4, scheduler=PlaybackScheduler(duration=0.))
+    moves = []
+    stream = mover.mouse_move_stream(lambda x, y: moves.append((x, y)), lambda x, y: None, 1500, 800, 1510, 810)
+    steps = []
+    for indx, step in enumerate(stream):
+        steps.append(step)
+        if indx == 10:
+            # Sending step gets the current step back
+            assert stream.send((200, 900, 210, 910)) == step
+
+    assert [step[:2] for step in steps] == moves
+    assert 200 <= moves[-1][0] <= 210 and 900 <= moves[-1][1] <= 910
+    assert (mover.x, mover.y) == moves[-1]
+
+
+def test_stream_closed_early_keeps_the_emitted_position():
+    def stream(seed, moves):
+        # Curves to the screen corner go off the screen and get clipped
+        mover = MouseMover(800, 600, x=700, y=500, seed=seed, scheduler=PlaybackScheduler(duration=0.))
+        return mover, mover.mouse_move_stream(lambda x, y: moves.append((x, y)), lambda x, y: None, 795, 595, 799, 599)
+
+    for seed in range(10):
+        full = []
+        for _ in stream(seed, full)[1]:
+            pass
+        for steps_count in range(1, len(full)):
+            moves = []
+            mover, steps = stream(seed, moves)
+            for _ in range(steps_count):
+                next(steps)
+            steps.close()
+
+            assert (mover.x, mover.y) == moves[-1] == full[steps_count - 1]
+            assert 0 <= mover.x < 800 and 0 <= mover.y < 600
+
+
+PATH_BOXES = [(300, 600, 304, 604), (900, 100, 904, 104), (1500, 650, 1504, 654)]
+
+
+@pytest.mark.parametrize("click_waypoints", [True, False])
+def test_path_waypoint_and_fake_clicks(click_waypoints):
+    # Tiny threshold, so the fake clicks often fall on the waypoints themselves
+    seed, threshold = 6, 1
+    planner = MouseMover(1920, 1080, x=100, y=100, seed=seed, scheduler=PlaybackScheduler(duration=0.))
+    _, _, planned = planner._plan_path(PATH_BOXES, True, threshold, click_waypoints)
+    waypoints = np.flatnonzero(planned.flags & Trajectory.WAYPOINT)
+    fakes = np.flatnonzero(planned.flags & Trajectory.FAKE)
+
+    mover, events, histogram = traced_mover(seed)
+    clicks = []
+    mover.mouse_move_path(lambda x, y: None, lambda x, y: clicks.append((x, y)), PATH_BOXES, allow_fakes=True,
+                          click_thershold=threshold, click_waypoints=click_waypoints)
+    labelled = {name: [event[1] for event in events if event[0] == name] for name in ("click", "fake_click")}
+
+    assert len(waypoints) == len(PATH_BOXES) and len(fakes) > 0
+    assert labelled["fake_click"] == fakes.tolist()
+    assert histogram.summary()["counters"]["fake_clicks"] == len(fakes)
+    if click_waypoints:
+        assert labelled["click"] == waypoints.tolist()
+        assert not np.any(planned.flags[waypoints] & Trajectory.FAKE)
+        for number, box in zip(labelled["click"], PATH_BOXES):
+            x, y = planned[number]
+            assert box[0] <= x <= box[2] and box[1] <= y <= box[3]
+    else:
+        # A fake click landing on a waypoint is still a fake one
+        assert np.any(planned.flags[waypoints] & Trajectory.FAKE)
+        assert labelled["click"] == []
+    assert len(clicks) == len(labelled["click"]) + len(labelled["fake_click"])
@@ -0,0 +1,57 @@
+import time
+import numpy as np
+import pytest
+from base_functions import to_unit_frame
+from playback import PlaybackScheduler
+from prefetch import TrajectoryPrefetcher
+from mouse_mover import MouseMover
+
+
+def deviation(points, start, end):
+    """Max deviation from the straight line, share of the distance"""
+    return np.abs(to_unit_frame(np.asarray(points, dtype=np.float64), start, end)[:, 1]).max()
+
+
+def filled(prefetcher, timeout: float = 60.):
+    prefetcher.start()
+    deadline = time.perf_counter() + timeout
+    total = len(prefetcher._queues) * prefetcher.queue_size
+    while prefetcher.stats["ready"] < total:
+        assert time.perf_counter() < deadline, "Prefetch queues are not filled in time"
+        time.sleep(0.01)
+    prefetcher.stop()
+    return prefetcher
+
+
+@pytest.mark.parametrize("degrees", [3., 30., 60.])
+def test_prefetched_curvature_matches_direct(degrees):
+    count = 150
+    mover = MouseMover(1920, 1080, seed=1, scheduler=PlaybackScheduler(duration=0.))
+    prefetcher = filled(TrajectoryPrefetcher(mover._prefetch_curve, buckets=[700.], queue_size=count, rng=2, angles=16))
+
+    start = (200., 150.)
+    angle = np.radians(degrees)
+    end = (start[0] + 700. * np.cos(angle), start[1] + 700. * np.sin(angle))
+    prefetched = [deviation(prefetcher.get(start, end), start, end) for _ in range(count)]
+    direct = [deviation(mover._generate_curve(*start, *end, 1920, 1080, 30, 100, mover._rng), start, end)
+              for _ in range(count * 2)]
+
+    assert prefetcher.stats["hits"] == count
+    # Curves generated along the x axis only were 2-4 times flatter for the diagonal moves
+    assert np.mean(prefetched) == pytest.approx(np.mean(direct), rel=0.2)
+
+
+def test_restart_and_buckets():
+    prefetcher = TrajectoryPrefetcher(lambda distance, angle, rng: [(0, 0), (distance * np.cos(angle),
+                                                                             distance * np.sin(angle))],
+                                      buckets=[100.], queue_size=1, rng=0, angles=4)
+    filled(prefetcher)
+    filled(prefetcher)
+
+    # Directions at right angles share a bucket, the others don't
+    assert prefetcher.get((0, 0), (100, 5)) is not None
+    assert prefetcher.get((0, 0), (-5, 100)) is None
+    assert prefetcher.get((0, 0), (70, 70)) is not None
+    # Too far from any distance bucket
+    assert prefetcher.get((0, 0), (300, 300)) is None
+    assert prefetcher.stats == {"hits": 2, "misses": 2, "ready": 2}
@@ -0,0 +1,54 @@
+import zlib
+import struct
+import numpy as np
+import pytest
+from render import Renderer, encode_png, PNG_SIGNATURE
+
+
+def decode_png(data):
+    """Minimal decoder of the non-interlaced 8-bit grayscale and RGB PNGs, checks every chunk CRC"""
+    assert data[:8] == PNG_SIGNATURE
+    position = 8
+    chunks = []
+    while position < len(data):
+        length, = struct.unpack_from(">I", data, position)
+        kind = data[position + 4:position + 8]
+        body = data[position + 8:position + 8 + length]
+        crc, = struct.unpack_from(">I", data, position + 8 + length)
+        assert crc == zlib.crc32(kind + body)
+        chunks.append((kind, body))
+        position += 12 + length
+
+    assert chunks[0][0] == b"IHDR" and chunks[-1] == (b"IEND", b"")
+    width, height, depth, color, compression, filtering, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    assert (depth, compression, filtering, interlace) == (8, 0, 0, 0)
+    channels = {0: 1, 2: 3}[color]
+    raw = zlib.decompress(b"".join(body for kind, body in chunks if kind == b"IDAT"))
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(height, 1 + width * channels)
+    # No filtering is used
+    assert not rows[:, 0].any()
+    image = rows[:, 1:].reshape(height, width, channels)
+    return image[:, :, 0] if color == 0 else image
+
+
+@pytest.mark.parametrize("shape", [(7, 5, 3), (7, 5), (1, 1, 3)])
+def test_encode_png_decodes(shape):
+    image = np.random.default_rng(0).integers(0, 256, size=shape, dtype=np.uint8)
+
+    np.testing.assert_array_equal(decode_png(encode_png(image, level=1)), image)
+
+
+def test_encode_png_rejects_bad_shapes():
+    with pytest.raises(ValueError):
+        encode_png(np.zeros((4, 4, 4), dtype=np.uint8))
+
+
+def test_heatmap_cells():
+    renderer = Renderer(16, 8, color=(255, 255, 255))
+    heatmap = renderer.heatmap([(3.9, 0.), (4., 4.), (7.99, 7.99), (15.9, 7.9), (-3., 100.)], cell=4, gamma=1.)
+
+    # Cells are [0, 4), [4, 8) and so on, the points out of the canvas go to the border cells
+    density = heatmap[::4, ::4, 0]
+    np.testing.assert_array_equal(density, [[128, 0, 0, 0], [128, 255, 0, 128]])
+    # Every cell is drawn as a square of cell pixels
+    np.testing.assert_array_equal(heatmap[:4, :4], np.full((4, 4, 3), 128))
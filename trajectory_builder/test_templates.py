@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from base_functions import to_unit_frame
+from playback import PlaybackScheduler
+from templates import TemplateLibrary
+from mouse_mover import MouseMover
+
+
+def deviation(points, start, end):
+    """Max deviation from the straight line, share of the distance"""
+    return np.abs(to_unit_frame(np.asarray(points, dtype=np.float64), start, end)[:, 1]).max()
+
+
+def test_template_library_round_trip(tmp_path):
+    path = str(tmp_path / "templates.bin")
+    count = TemplateLibrary.build(path, distances=(100, 400), per_distance=2, rng=1, angles=4, knots_count=2)
+    library = TemplateLibrary(path)
+
+    assert len(library) == count == 16
+    assert library.angles == 4
+    np.testing.assert_array_equal(library.index["distance"], np.repeat([100., 400.], 8))
+    np.testing.assert_array_equal(library.index["angle"], np.tile(np.repeat(np.arange(4), 2), 2))
+    for template_id in range(count):
+        points = library.template(template_id)
+        # Unit frame: every template goes from (0, 0) to about (1, 0), the distortion may shift the end a bit
+        np.testing.assert_allclose(points[0], (0., 0.), atol=1e-6)
+        np.testing.assert_allclose(points[-1], (1., 0.), atol=0.1)
+
+    points = library.sample((10, 10), (110, 10), rng=2)
+    np.testing.assert_allclose(points[0], (10., 10.), atol=1e-3)
+    np.testing.assert_allclose(points[-1], (110., 10.), atol=5.)
+
+
+def test_sample_filters_direction(tmp_path):
+    path = str(tmp_path / "templates.bin")
+    TemplateLibrary.build(path, distances=(100,), per_distance=1, rng=1, angles=4)
+    library = TemplateLibrary(path)
+    # The unit frame curves of the different direction buckets differ, so the bucket is told by the curve
+    unit = [library.template(template_id) for template_id in range(4)]
+
+    for degrees, bucket in ((10., 0), (100., 0), (-80., 0), (30., 1), (60., 2), (215., 1), (85., 3)):
+        angle = np.radians(degrees)
+        end = (100. * np.cos(angle), 100. * np.sin(angle))
+        points = to_unit_frame(library.sample((0, 0), end, rng=0), (0, 0), end)
+        np.testing.assert_allclose(points, unit[bucket], atol=1e-5)
+
+
+@pytest.mark.parametrize("degrees", [3., 30., 60.])
+def test_template_curvature_matches_direct(tmp_path, degrees):
+    count = 200
+    mover = MouseMover(1920, 1080, seed=1, scheduler=PlaybackScheduler(duration=0.))
+    mover.build_templates(str(tmp_path / "templates.bin"), distances=(700,), per_distance=count)
+
+    start = (200., 150.)
+    angle = np.radians(degrees)
+    end = (start[0] + 700. * np.cos(angle), start[1] + 700. * np.sin(angle))
+    sampled = [deviation(mover.templates.sample(start, end, mover._rng), start, end) for _ in range(count)]
+    direct = [deviation(mover._generate_curve(*start, *end, 1920, 1080, 30, 100, mover._rng), start, end)
+              for _ in range(count * 2)]
+
+    # Templates generated along the x axis only were 2-4 times flatter for the diagonal moves
+    assert np.mean(sampled) == pytest.approx(np.mean(direct), rel=0.2)
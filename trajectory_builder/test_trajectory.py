@@ -0,0 +1,122 @@
+"""
+Trajectory serialization and curve generation checks. The modules import each other script-style,
+run from this directory or with it on the path: python -m pytest trajectory_builder
+"""
+import pickle
+import numpy as np
+import pytest
+from trajectory import HumanCurve, Trajectory
+
+
+def make_trajectory(dtype=np.float32):
+    rng = np.random.default_rng(0)
+    xy = np.cumsum(rng.normal(0., 3., size=(200, 2)), axis=0) + 500.
+    times = np.linspace(0., 0.4, 200)
+    flags = (rng.random(200) < 0.1) * Trajectory.CLICK
+    return Trajectory(xy, times, flags, dtype=dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.int16])
+@pytest.mark.parametrize("delta", [False, True])
+@pytest.mark.parametrize("level", [0, 6])
+def test_bytes_round_trip(dtype, delta, level):
+    trajectory = make_trajectory(dtype)
+    restored = Trajectory.from_bytes(trajectory.to_bytes(delta=delta, level=level))
+
+    assert restored.xy.dtype == trajectory.xy.dtype
+    np.testing.assert_array_equal(restored.xy, trajectory.xy)
+    np.testing.assert_array_equal(restored.times, trajectory.times)
+    np.testing.assert_array_equal(restored.flags, trajectory.flags)
+
+
+def test_bytes_round_trip_bare_points():
+    trajectory = Trajectory(make_trajectory().xy)
+    restored = Trajectory.from_bytes(trajectory.to_bytes(delta=True, level=1))
+
+    np.testing.assert_array_equal(restored.xy, trajectory.xy)
+    assert restored.times is None and restored.flags is None
+
+
+def test_from_bytes_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        Trajectory.from_bytes(b"NOPE" + bytes(Trajectory.HEADER.size))
+
+
+def test_array_copy_semantics():
+    trajectory = make_trajectory()
+
+    assert np.asarray(trajectory) is trajectory.xy
+    copied = np.array(trajectory, copy=True)
+    assert not np.shares_memory(copied, trajectory.xy)
+    np.testing.assert_array_equal(copied, trajectory.xy)
+    assert np.asarray(trajectory, dtype=np.float64).dtype == np.float64
+    assert np.asarray(trajectory, dtype=np.float32, copy=False) is trajectory.xy
+    with pytest.raises(ValueError):
+        np.asarray(trajectory, dtype=np.float64, copy=False)
+
+
+def test_sequence_views_and_pickling():
+    trajectory = make_trajectory(np.int16)
+    part = trajectory[10:20]
+
+    assert len(part) == 10 and np.shares_memory(part.xy, trajectory.xy)
+    assert part[0] == tuple(trajectory.xy[10].tolist()) and part[0] in trajectory
+    np.testing.assert_array_equal(part.clicks, trajectory.flags[10:20] == Trajectory.CLICK)
+    assert pickle.loads(pickle.dumps(trajectory)) == trajectory
+    assert Trajectory.concat([trajectory[:50], trajectory[50:]]) == trajectory
+    # Timestamps are dropped if a part has none
+    assert Trajectory.concat([trajectory[:50], Trajectory(trajectory.xy[50:])]).times is None
+
+
+def test_int16_range_check():
+    with pytest.raises(ValueError):
+        Trajectory([(0., 0.), (40000., 0.)], dtype=np.int16)
+    np.testing.assert_array_equal(Trajectory([(0.4, 1.6)], dtype=np.int16).xy, [(0, 2)])
+
+
+def test_batch_seed_reproducibility():
+    starts = np.arange(40, dtype=np.float64).reshape(20, 2) * 7
+    ends = starts[::-1] * 9 + 50
+
+    def generate(rng):
+        return HumanCurve.generate_batch(starts, ends, rng=rng, knots_count=np.arange(20) % 4)
+
+    points, offsets = generate(5)
+    same_points, same_offsets = generate(np.random.default_rng(5))
+    other_points, _ = generate(6)
+
+    np.testing.assert_array_equal(points, same_points)
+    np.testing.assert_array_equal(offsets, same_offsets)
+    assert points.shape != other_points.shape or not np.array_equal(points, other_points)
+
+
+def test_curve_seed_or_generator():
+    curve = HumanCurve((10, 10), (700, 400), rng=5)
+    same_curve = HumanCurve((10, 10), (700, 400), rng=np.random.default_rng(5))
+    other_curve = HumanCurve((10, 10), (700, 400), rng=6)
+
+    np.testing.assert_array_equal(np.asarray(curve.points), np.asarray(same_curve.points))
+    assert not np.array_equal(np.asarray(curve.points), np.asarray(other_curve.points))
+
+
+def test_iter_points_matches_points():
+    curve = HumanCurve((10, 10), (700, 400), rng=3, target_points=57)
+    streamed = list(HumanCurve((10, 10), (700, 400), rng=3, target_points=57).iter_points(chunk_size=8))
+
+    assert len(curve) == len(streamed) == 57
+    np.testing.assert_array_equal(np.array(streamed, dtype=np.float32), np.asarray(curve.points))
+
+
+def test_iter_points_retarget():
+    full = np.asarray(HumanCurve((100, 100), (900, 500), rng=3).points, dtype=np.float64)
+    points = HumanCurve((100, 100), (900, 500), rng=3).iter_points(chunk_size=8)
+    emitted = np.array([next(points) for _ in range(20)])
+    target = (200., 800.)
+    rest = np.array([points.send(target)] + list(points))
+
+    # Points before the retarget are the ones of the original curve
+    np.testing.assert_allclose(emitted, full[:20], rtol=1e-6)
+    # Continuation goes on from the current point without a jump and ends at the new target
+    assert np.hypot(*(rest[0] - emitted[-1])) <= 3 * np.hypot(*np.diff(emitted, axis=0).T).max()
+    assert np.hypot(*(rest[-1] - target)) < 10.
+    assert len(rest) < len(full)
@@ -1,18 +1,226 @@
-import pytweening
-import random
-from datetime import datetime
+import zlib
+import struct
+import itertools
 from base_functions import *
+from instrumentation import DISABLED
+from easing import easing_table, get_easing, DEFAULT_EASING
+
+
+class Trajectory:
+    """
+    Compact curve: contiguous (N, 2) array of the points coords, float32 or int16 (whole pixels), with optional
+    per-point timestamps (float32 seconds from the start) and event flags (uint8 bits, see CLICK). \n
+    Behaves as a read-only sequence of (x, y) tuples. Slices are views sharing the arrays,
+    np.asarray(trajectory) gives the coords without copying. Pickles as the bare arrays
+    """
+    __slots__ = ("xy", "times", "flags")
+
+    # Event flags bits: click at the point, the point is a path waypoint, the click is a fake one
+    CLICK = 1
+    WAYPOINT = 2
+    FAKE = 4
+
+    # Serialized layout: header, coords, timestamps, flags. All little-endian
+    MAGIC = b"HLTJ"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBBBxI")
+    DTYPES = (np.dtype("<f4"), np.dtype("<i2"))
+    # Header options bits
+    HAS_TIMES = 1
+    HAS_FLAGS = 2
+    DELTA = 4
+    COMPRESSED = 8
+
+    def __init__(self, xy, times=None, flags=None, dtype=None):
+        """
+        :param xy: (N, 2) array-like of x, y
+        :param times: (N,) array-like of the points timestamps, seconds. Default = none
+        :param flags: (N,) array-like of the points event flags. Default = none
+        :param dtype: coords dtype, float32 or int16 (coords are rounded then). Default = int16 for int16 coords,
+        float32 otherwise
+        """
+        xy = np.asarray(xy)
+        if dtype is None:
+            dtype = np.int16 if xy.dtype == np.int16 else np.float32
+        dtype = np.dtype(dtype)
+        if dtype not in self.DTYPES:
+            raise ValueError("dtype must be either float32 or int16")
+        if xy.size == 0:
+            xy = xy.reshape(0, 2)
+        if xy.ndim != 2 or xy.shape[1] != 2 or xy.dtype.kind not in "biuf":
+            raise ValueError("xy must be valid list of points")
+        if dtype.kind == "i" and xy.dtype != dtype:
+            xy = np.rint(xy)
+            if xy.size and (xy.min() < np.iinfo(dtype).min or xy.max() > np.iinfo(dtype).max):
+                raise ValueError("Coords are out of int16 range")
+
+        self.xy = np.ascontiguousarray(xy, dtype=dtype)
+        self.times = None if times is None else np.ascontiguousarray(times, dtype=np.float32)
+        self.flags = None if flags is None else np.ascontiguousarray(flags, dtype=np.uint8)
+        for name, val in (("times", self.times), ("flags", self.flags)):
+            if val is not None and val.shape != (self.xy.shape[0],):
+                raise ValueError(f"{name} must have a value per point")
+
+    @classmethod
+    def _view(cls, xy, times, flags):
+        """Trajectory over the given arrays as they are, no checks and no copies"""
+        trajectory = cls.__new__(cls)
+        trajectory.xy = xy
+        trajectory.times = times
+        trajectory.flags = flags
+        return trajectory
+
+    def __len__(self):
+        return self.xy.shape[0]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self._view(self.xy[item], None if self.times is None else self.times[item],
+                              None if self.flags is None else self.flags[item])
+        return tuple(self.xy[item].tolist())
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __contains__(self, point):
+        return bool(np.any((self.xy[:, 0] == point[0]) & (self.xy[:, 1] == point[1])))
+
+    def __eq__(self, other):
+        if not isinstance(other, Trajectory):
+            return NotImplemented
+        return all(np.array_equal(mine, theirs) if mine is not None and theirs is not None else mine is theirs
+                   for mine, theirs in ((self.xy, other.xy), (self.times, other.times), (self.flags, other.flags)))
+
+    __hash__ = None
+
+    def __array__(self, dtype=None, copy=None):
+        # copy=None copies only if needed, True always does, False never may
+        if copy is False and dtype is not None and np.dtype(dtype) != self.xy.dtype:
+            raise ValueError(f"Unable to avoid a copy converting {self.xy.dtype} coords to {np.dtype(dtype)}")
+        if dtype is None:
+            return self.xy.copy() if copy else self.xy
+        return self.xy.astype(dtype, copy=bool(copy))
+
+    def __reduce__(self):
+        return self._view, (self.xy, self.times, self.flags)
+
+    def __repr__(self):
+        return f"Trajectory({len(self)} points, {self.xy.dtype}, times={self.times is not None}, " \
+               f"flags={self.flags is not None})"
+
+    def tolist(self):
+        """List of (x, y) tuples"""
+        return list(map(tuple, self.xy.tolist()))
+
+    @property
+    def nbytes(self):
+        """Memory taken by the arrays"""
+        return sum(val.nbytes for val in (self.xy, self.times, self.flags) if val is not None)
+
+    @property
+    def clicks(self):
+        """(N,) bool array of the points with CLICK flag"""
+        if self.flags is None:
+            return np.zeros(len(self), dtype=bool)
+        return (self.flags & self.CLICK).astype(bool)
+
+    def replace(self, times=None, flags=None):
+        """New trajectory with the given timestamps and / or flags, sharing the rest of the arrays"""
+        return Trajectory(self.xy, self.times if times is None else times, self.flags if flags is None else flags)
+
+    @classmethod
+    def concat(cls, trajectories):
+        """
+        Joins the trajectories into one. Timestamps and flags are kept only if all the trajectories have them
+        """
+        trajectories = list(trajectories)
+        if not trajectories:
+            return cls(np.empty((0, 2)))
+        parts = {name: [getattr(trajectory, name) for trajectory in trajectories]
+                 for name in ("xy", "times", "flags")}
+        dtype = np.result_type(*parts["xy"])
+        return cls(np.concatenate(parts["xy"]),
+                   None if any(part is None for part in parts["times"]) else np.concatenate(parts["times"]),
+                   None if any(part is None for part in parts["flags"]) else np.concatenate(parts["flags"]),
+                   dtype=dtype if dtype in cls.DTYPES else np.float32)
+
+    def to_bytes(self, delta: bool = False, level: int = 0):
+        """
+        Serializes the trajectory
+        :param delta: store the differences between the consecutive coords and timestamps. Lossless, makes
+        int16 coords small numbers which compress well
+        :param level: zlib compression level. Default = no compression
+        :return: bytes
+        """
+        options = (self.HAS_TIMES if self.times is not None else 0) | (self.HAS_FLAGS if self.flags is not None else 0) \
+            | (self.DELTA if delta else 0) | (self.COMPRESSED if level else 0)
+        arrays = [self.xy.astype(self.xy.dtype.newbyteorder("<"), copy=False)]
+        if self.times is not None:
+            arrays.append(self.times.astype("<f4", copy=False))
+        if delta:
+            arrays = [self._delta(val) for val in arrays]
+        if self.flags is not None:
+            arrays.append(self.flags)
+
+        payload = b"".join(val.tobytes() for val in arrays)
+        if level:
+            payload = zlib.compress(payload, level)
+        return self.HEADER.pack(self.MAGIC, self.VERSION, self.DTYPES.index(self.xy.dtype), options, len(self)) \
+            + payload
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Restores a trajectory serialized with to_bytes(). The arrays are read-only views of the data
+        unless it is delta encoded or compressed
+        """
+        magic, version, dtype_code, options, size = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a trajectory or an unsupported version")
+        payload = memoryview(data)[cls.HEADER.size:]
+        if options & cls.COMPRESSED:
+            payload = zlib.decompress(payload)
+
+        offset = 0
+
+        def take(dtype, shape):
+            nonlocal offset
+            val = np.frombuffer(payload, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+            offset += val.nbytes
+            return cls._undelta(val) if options & cls.DELTA and dtype != np.uint8 else val
+
+        xy = take(cls.DTYPES[dtype_code], (size, 2))
+        times = take(np.dtype("<f4"), (size,)) if options & cls.HAS_TIMES else None
+        flags = take(np.dtype(np.uint8), (size,)) if options & cls.HAS_FLAGS else None
+        return cls._view(xy, times, flags)
+
+    @staticmethod
+    def _delta(val):
+        """Differences of the consecutive values, taken on the raw bits with wraparound so they are exact"""
+        bits = val.view(f"<u{val.dtype.itemsize}")
+        res = bits.copy()
+        res[1:] -= bits[:-1]
+        return res.view(val.dtype)
+
+    @staticmethod
+    def _undelta(val):
+        """Reverts _delta()"""
+        bits = val.view(f"<u{val.dtype.itemsize}")
+        return np.cumsum(bits, axis=0, dtype=bits.dtype).view(val.dtype)
 
 
 class HumanCurve:
     """
     Generates a human-like mouse curve starting at given source point, and finishing in a given destination point. \n
     """
-    def __init__(self, from_point, to_point, **kwargs):
+    def __init__(self, from_point, to_point, rng=None, **kwargs):
         """
-        Base constructor, taking start and end points as well as some optional parameters for curve building
+        Base constructor, taking start and end points as well as some optional parameters for curve building.
+        All the random choices, distortion included, are made here, the points themselves are evaluated on first access
+        to points or by iter_points()
         :param from_point: start point, x and y float coords
         :param to_point: end point, x and y float coords
+        :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
         :keyword knots_count: number of additional points for curve construction. Default = 2
         :keyword target_points: total count of points on the curve. Default = 100
         :keyword interp_step: number of curve's parts to apply linear interpolation to. Default = random.choice(range(5, 20)
@@ -20,82 +228,408 @@ class HumanCurve:
         :keyword left_boundary, right_boundary, down_boundary, up_boundary: actual boundaries, not used explicitly
         :keyword distortion_mean, distortion_stdev: distortion distribution params (mean and standard deviation). Default = 1
         :keyword distortion_frequency: self-explanatory though requires some testing. Default = 0.5
+        :keyword tweening: easing function or pytweening function name, e.g. easing.random_profile().
+        Default = easeOutQuad
+        :keyword start_velocity: (x, y) displacement per point the curve starts with, e.g. to continue another curve.
+        Requires knots_count > 0. Default = random direction
+        :keyword instrumentation: Instrumentation to report the stages timings to. Default = disabled
         """
         self.fromPoint = from_point
         self.toPoint = to_point
+        self.rng = np.random.default_rng(rng)
+
+        self._kwargs = kwargs
+        self._plan = self.plan_batch([self.fromPoint], [self.toPoint], rng=self.rng, **kwargs)
+        self._points = None
+
+    def __len__(self):
+        """Number of the curve points, known before they are evaluated"""
+        return self._plan["virtual_indx"].shape[0]
+
+    @property
+    def points(self):
+        """Trajectory of the curve points"""
+        if self._points is None:
+            self._points = Trajectory(self.evaluate_plan(self._plan))
+        return self._points
+
+    def iter_points(self, chunk_size: int = 16):
+        """
+        Yields the curve points, evaluating them chunk by chunk, so the first ones are ready at once. \n
+        Send a new destination point to the generator to retarget the curve mid-flight: the rest of the curve
+        is replaced by a continuation from the last yielded point, keeping the current movement direction and speed.
+        send() returns the first point of the continuation
+        :param chunk_size: number of points evaluated at once
+        """
+        curve = self
+        points = self._points
+        first = 0
+        previous = None
+        while True:
+            if points is None:
+                points = curve._iter_chunks(chunk_size)
+            for point in itertools.islice(points, first, None):
+                retarget = yield point
+                if retarget is not None:
+                    break
+                previous = point
+            else:
+                return
+
+            previous = previous or point
+            velocity = (point[0] - previous[0], point[1] - previous[1])
+            curve = curve.continuation(point, retarget, velocity)
+            previous = point
+            points = None
+            # Continuation starts at the current point, which is already emitted
+            first = 1
 
-        # For better random probably
-        seed_core = (datetime.now().microsecond - self.fromPoint[1] ** self.toPoint[0]) + \
-                    (self.fromPoint[0] & self.toPoint[1])
-        random.seed(seed_core)
+    def _iter_chunks(self, chunk_size: int):
+        """Evaluates the points chunk by chunk, stores them all as points once finished"""
+        total = len(self)
+        evaluated = []
+        first = 0
+        while first < total:
+            last = min(first + max(chunk_size, 1), total)
+            # Same precision as points have
+            chunk = self.evaluate_plan(self._plan, first, last).astype(np.float32)
+            evaluated.append(chunk)
+            yield from map(tuple, chunk.tolist())
+            first = last
+        self._points = Trajectory(np.concatenate(evaluated))
 
-        self.points = self.generate_curve(**kwargs)
+    def continuation(self, from_point, to_point, velocity):
+        """
+        New curve from the point on this curve to the new destination, starting with the given velocity.
+        Uses the params of this curve, points number is scaled by the distance left
+        :param velocity: (x, y) displacement per point at from_point
+        """
+        kwargs = {key: val for key, val in self._kwargs.items()
+                  if key not in ("left_boundary", "right_boundary", "down_boundary", "up_boundary")}
+        whole = np.hypot(self.toPoint[0] - self.fromPoint[0], self.toPoint[1] - self.fromPoint[1])
+        left = np.hypot(to_point[0] - from_point[0], to_point[1] - from_point[1])
+        target_points = kwargs.get("target_points", 100)
+        kwargs["target_points"] = int(max(target_points * min(left / whole, 1.) if whole > 0 else target_points, 2))
+        kwargs["knots_count"] = max(kwargs.get("knots_count", 2), 1)
+        kwargs["start_velocity"] = velocity
+        return HumanCurve(from_point, to_point, self.rng, **kwargs)
 
     def generate_curve(self, **kwargs):
         """
         Generates a curve according to the parameters specified below. \n
         You can override any of the below parameters. If no parameter is passed, the default value is used
         """
+        points, _ = self.generate_batch([self.fromPoint], [self.toPoint], rng=self.rng, **kwargs)
+        return Trajectory(points)
+
+    @staticmethod
+    def generate_batch(starts, ends, rng=None, **kwargs):
+        """
+        Generates a batch of curves in one vectorized pass. Accepts the same keywords as the constructor,
+        every numeric keyword and tweening may be either a single value or a sequence with a value per curve
+        :param starts: start points, (B, 2) array-like
+        :param ends: end points, (B, 2) array-like
+        :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
+        :keyword chain: the curves make a path, each one starts where the previous one ends. Joints are smoothed,
+        see chain_knots(). Default = False
+        :return: tuple of (P, 2) float array of all the curves points and (B + 1) int array of offsets,
+        points of the i-th curve are points[offsets[i]:offsets[i + 1]]
+        """
+        plan = HumanCurve.plan_batch(starts, ends, rng, **kwargs)
+        return HumanCurve.evaluate_plan(plan), plan["offsets"]
+
+    @staticmethod
+    def plan_batch(starts, ends, rng=None, **kwargs):
+        """
+        First part of generate_batch(): makes all the random choices and picks the virtual points to evaluate.
+        Costs O(knots_count + interp_step + target_points) per curve
+        :return: plan dict, see evaluate_plan()
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        if starts.shape != ends.shape:
+            raise ValueError("starts and ends must have the same number of points")
+        size = starts.shape[0]
+        rng = np.random.default_rng(rng)
+
         # Args extraction
-        offset_boundary_x = kwargs.get("offset_boundary_x", 100)
-        offset_boundary_y = kwargs.get("offset_boundary_y", 100)
-        interp_step = kwargs.get("interp_step", random.choice(range(5, 20)))
-        left_boundary = kwargs.get("left_boundary", min(self.fromPoint[0], self.toPoint[0])) - offset_boundary_x
-        right_boundary = kwargs.get("right_boundary", max(self.fromPoint[0], self.toPoint[0])) + offset_boundary_x
-        down_boundary = kwargs.get("down_boundary", min(self.fromPoint[1], self.toPoint[1])) - offset_boundary_y
-        up_boundary = kwargs.get("up_boundary", max(self.fromPoint[1], self.toPoint[1])) + offset_boundary_y
-        knots_count = kwargs.get("knots_count", 2)
-        distortion_mean = kwargs.get("distortion_mean", 1)
-        distortion_stdev = kwargs.get("distortion_stdev", 1)
-        distortion_frequency = kwargs.get("distortion_frequency", 0.5)
-        tween = kwargs.get("tweening", pytweening.easeOutQuad)
-        target_points = kwargs.get("target_points", 100)
+        offset_boundary_x = broadcast_param(kwargs.get("offset_boundary_x", 100), size)
+        offset_boundary_y = broadcast_param(kwargs.get("offset_boundary_y", 100), size)
+        interp_step = broadcast_param(kwargs.get("interp_step", rng.integers(5, 20, size=size)), size, np.int64)
+        left_boundary = broadcast_param(kwargs.get("left_boundary", np.minimum(starts[:, 0], ends[:, 0])), size)
+        right_boundary = broadcast_param(kwargs.get("right_boundary", np.maximum(starts[:, 0], ends[:, 0])), size)
+        down_boundary = broadcast_param(kwargs.get("down_boundary", np.minimum(starts[:, 1], ends[:, 1])), size)
+        up_boundary = broadcast_param(kwargs.get("up_boundary", np.maximum(starts[:, 1], ends[:, 1])), size)
+        knots_count = broadcast_param(kwargs.get("knots_count", 2), size, np.int64)
+        distortion_mean = broadcast_param(kwargs.get("distortion_mean", 1), size)
+        distortion_stdev = broadcast_param(kwargs.get("distortion_stdev", 1), size)
+        distortion_frequency = broadcast_param(kwargs.get("distortion_frequency", 0.5), size)
+        tween = kwargs.get("tweening", DEFAULT_EASING)
+        tween = [get_easing(val) for val in tween] if isinstance(tween, (list, tuple)) else get_easing(tween)
+        target_points = broadcast_param(kwargs.get("target_points", 100), size, np.int64)
+        start_velocity = kwargs.get("start_velocity")
+        instrumentation = kwargs.get("instrumentation", DISABLED)
+
+        if np.any(target_points < 2):
+            raise ValueError("target_points must be an integer greater or equal to 2")
+        if np.any((distortion_frequency < 0) | (distortion_frequency > 1)):
+            raise ValueError("distortionFrequency must be in range [0,1]")
+        if isinstance(tween, list) and len(tween) != size:
+            raise ValueError(f"tweening must be a single function or a sequence of {size} functions")
+
+        # Virtual curve resolution: number of points the curve would have being evaluated pixel by pixel.
+        # Curves are never evaluated at this resolution, only at the points picked by tweening
+        mid_pts_cnt = np.maximum(np.abs(starts - ends).max(axis=1), 2).astype(np.int64)
 
         # Get internal knots
-        internal_knots = self.generate_internal_knots(left_boundary, right_boundary,
-                                                      down_boundary, up_boundary, knots_count)
-        # Get curve actual points
-        points = self.generate_points(internal_knots)
+        with instrumentation.stage("knots"):
+            knots = HumanCurve.generate_batch_knots(left_boundary - offset_boundary_x,
+                                                    right_boundary + offset_boundary_x,
+                                                    down_boundary - offset_boundary_y,
+                                                    up_boundary + offset_boundary_y, knots_count, rng)
+            if start_velocity is not None:
+                knots = HumanCurve.lead_knots(knots, knots_count, starts, ends, target_points,
+                                              np.asarray(start_velocity, dtype=np.float64).reshape(-1, 2))
+            if kwargs.get("chain", False):
+                knots = HumanCurve.chain_knots(knots, knots_count, starts, ends)
+        # Random linear interpolation, described by segments of the virtual points sequences
+        with instrumentation.stage("interpolation"):
+            segments = HumanCurve.plan_interpolation(mid_pts_cnt, interp_step, rng)
+
+        # Tweening: indices of the virtual points to keep
+        with instrumentation.stage("tweening"):
+            offsets = np.concatenate(([0], np.cumsum(target_points)))
+            curve_indx = np.repeat(np.arange(size), target_points)
+            virtual_indx = HumanCurve.tween_indices(segments, tween, target_points, offsets, curve_indx)
+        # Distortion accordingly to params, drawn beforehand so any range of points is distorted the same way
+        with instrumentation.stage("distortion"):
+            delta = HumanCurve.distortion_deltas(virtual_indx, curve_indx, segments, distortion_mean,
+                                                 distortion_stdev, distortion_frequency, rng)
+
+        return {"starts": starts, "ends": ends, "knots": knots, "knots_count": knots_count, "mid_pts_cnt": mid_pts_cnt,
+                "segments": segments, "offsets": offsets, "curve_indx": curve_indx, "virtual_indx": virtual_indx,
+                "delta": delta, "instrumentation": instrumentation}
+
+    @staticmethod
+    def evaluate_plan(plan, first: int = 0, last: int = None):
+        """
+        Second part of generate_batch(): evaluates the planned points and applies their distortion. Points are packed
+        as the generate_batch() ones, a range of them may be evaluated only
+        :param plan: plan_batch() result
+        :param first: first point to evaluate
+        :param last: point to stop at (not evaluated). Default = the end
+        :return: (last - first, 2) float array
+        """
+        virtual_indx = plan["virtual_indx"][first:last]
+        curve_indx = plan["curve_indx"][first:last]
+        instrumentation = plan["instrumentation"]
+
+        # Get curves actual points only for the chosen indices
+        with instrumentation.stage("bezier"):
+            points = HumanCurve.evaluate_virtual_points(plan["starts"], plan["ends"], plan["knots"], plan["knots_count"],
+                                                        plan["mid_pts_cnt"], plan["segments"], virtual_indx, curve_indx)
+        points += plan["delta"][first:last]
+
+        instrumentation.count("points_generated", points.shape[0])
+        return points
+
+    @staticmethod
+    def lead_knots(knots, knots_count, starts, ends, target_points, start_velocity):
+        """
+        Replaces the first internal knot of each curve, so the curve leaves its start with the given velocity
+        (displacement per point), ignoring tweening. The knot is kept within the start-end distance
+        """
+        # Curve derivative at the start is n * (first knot - start), a point takes 1 / (target_points - 1) of it
+        lead = start_velocity * ((target_points - 1) / np.maximum(knots_count + 1, 1))[:, None]
+        distance = np.hypot(*(ends - starts).T)
+        length = np.hypot(*lead.T)
+        lead *= np.where(length > distance, distance / np.maximum(length, 1e-9), 1.)[:, None]
+
+        knots = knots.copy()
+        has_knots = knots_count > 0
+        knots[has_knots, 0] = starts[has_knots] + lead[has_knots]
+        return knots
+
+    @staticmethod
+    def chain_knots(knots, knots_count, starts, ends):
+        """
+        Replaces the first internal knot of every curve but the first one, so the curves following one another
+        make a path without sharp turns: each curve leaves its start in the direction the previous one arrives in.
+        The knot is put at 1 / (knots_count + 1) of the curve distance
+        """
+        knots = knots.copy()
+        for indx in range(1, knots.shape[0]):
+            if knots_count[indx] == 0:
+                continue
+            # Curve arrives at its end from its last knot
+            previous = knots[indx - 1, knots_count[indx - 1] - 1] if knots_count[indx - 1] > 0 else starts[indx - 1]
+            heading = ends[indx - 1] - previous
+            length = np.hypot(*heading)
+            if length > 0:
+                distance = np.hypot(*(ends[indx] - starts[indx]))
+                knots[indx, 0] = starts[indx] + heading / length * distance / (knots_count[indx] + 1)
+        return knots
+
+    @staticmethod
+    def generate_batch_knots(left_boundary, right_boundary, down_boundary, up_boundary, knots_count, rng):
+        """
+        Generates the internal knots for a batch of curves. The points are taken at random from the surfaces
+        delimited by given boundaries, padded to the biggest knots_count
+        :return: (B, max(knots_count), 2) float array
+        """
+        if np.any(knots_count < 0):
+            raise ValueError("knots_count must be non-negative integer")
+        if np.any(left_boundary > right_boundary):
+            raise ValueError("left_boundary must be less than or equal to right_boundary")
+        if np.any(down_boundary > up_boundary):
+            raise ValueError("down_boundary must be less than or equal to up_boundary")
+
+        shape = (knots_count.shape[0], int(knots_count.max(initial=0)))
+        low = np.floor(np.stack((left_boundary, down_boundary), axis=1)).astype(np.int64)
+        high = np.maximum(np.floor(np.stack((right_boundary, up_boundary), axis=1)).astype(np.int64), low + 1)
+        return rng.integers(low[:, None], high[:, None], size=shape + (2,)).astype(np.float64)
 
-        x_coords = [points[i] for i in range(len(points)) if i % 2 == 0]
-        y_coords = [points[i] for i in range(len(points)) if i % 2 == 1]
+    @staticmethod
+    def plan_interpolation(mid_pts_cnt, interp_step, rng):
+        """
+        Splits the virtual sequences of mid_pts_cnt curve points into segments. Each segment either keeps
+        the curve points as is or is replaced by a straight line with a random number of points.
+        Segments are padded to the biggest interp_step, padding segments have no points
+        :return: tuple of (B, max(interp_step) + 1) int arrays
+        (segment start index, segment end index, virtual points count, is interpolated)
+        """
+        size = mid_pts_cnt.shape[0]
+        last = mid_pts_cnt - 1
 
         # Get unique point indices and append the end point (excluding start point and end point)
-        random_points_indx = list(set(random.choices(range(1, len(x_coords) - 1), k=interp_step)))
-        random_points_indx.append(len(x_coords) - 1)
-        random_points_indx.sort()
-
-        # Result of applying interpolation and prev_indx to tie the line with
-        int_points = []
-        prev_indx = 0
-        # Interpolation itself
-        for indx in random_points_indx:
-            # Choosing whether to skip this point or not
-            skip = random.choice([True, False])
-            if not skip:
-                # Elements to fill with
-                elem_num = random.randrange(1 + (indx - prev_indx) // 2, indx - prev_indx + 2)
-                int_ys = [(y_coords[indx] - y_coords[prev_indx]) / elem_num * elem + y_coords[prev_indx] for elem in range(elem_num)]
-                int_xs = [(x_coords[indx] - x_coords[prev_indx]) / elem_num * elem + x_coords[prev_indx] for elem in range(elem_num)]
-
-                int_points.extend(list(map(lambda x, y: (x, y), int_xs, int_ys)))
-            else:
-                int_points.extend(list(map(lambda x, y: (x, y), x_coords[prev_indx:indx], y_coords[prev_indx:indx])))
-            prev_indx = indx
+        random_points_indx = rng.integers(1, np.maximum(last, 2)[:, None], size=(size, int(interp_step.max(initial=0))))
+        is_used = (np.arange(random_points_indx.shape[1]) < interp_step[:, None]) & (last > 1)[:, None]
+        random_points_indx = np.where(is_used, random_points_indx, last[:, None])
+        seg_end = np.sort(np.concatenate((random_points_indx, last[:, None]), axis=1), axis=1)
+        seg_start = np.concatenate((np.zeros((size, 1), dtype=np.int64), seg_end[:, :-1]), axis=1)
+        # Repeated indices become empty segments
+        span = seg_end - seg_start
 
-        # Distortion accordingly to params
-        int_points = self.distort_points(int_points, distortion_mean, distortion_stdev, distortion_frequency)
-        # Tweening
-        int_points = self.tween_points(int_points, tween, target_points)
+        # Choosing whether to skip the segment or not, elements to fill interpolated ones with
+        is_interp = rng.random(span.shape) < 0.5
+        elem_num = rng.integers(1 + span // 2, span + 2)
+        lengths = np.where(span > 0, np.where(is_interp, elem_num, span), 0)
 
-        return int_points
+        return seg_start, seg_end, lengths, is_interp
 
     @staticmethod
-    def generate_internal_knots(left_boundary, right_boundary, down_boundary, up_boundary, knots_count):
+    def tween_indices(segments, tween, target_points, offsets, curve_indx):
+        """
+        Chooses target_points indices of each virtual points sequence according to tweening function(tween),
+        a single one or a list with a function per curve. This function in fact controls the velocity of mouse movement
+        """
+        total = segments[2].sum(axis=1)
+
+        if isinstance(tween, list):
+            # A tween per curve, the tables are laid out as the curves points are
+            progress = np.concatenate([easing_table(curve_tween, int(count))
+                                       for curve_tween, count in zip(tween, target_points)])
+        else:
+            # tween is a function that takes a float 0..1 and returns a float 0..1, tabulated once per distinct points number
+            counts, count_indx = np.unique(target_points, return_inverse=True)
+            progress = np.concatenate([easing_table(tween, int(count)) for count in counts])
+            count_offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            local_indx = np.arange(curve_indx.shape[0]) - offsets[curve_indx]
+            progress = progress[count_offsets[count_indx.reshape(-1)][curve_indx] + local_indx]
+
+        curve_total = total[curve_indx]
+        return np.clip(np.trunc(progress * (curve_total - 1)).astype(np.int64), 0, curve_total - 1)
+
+    @staticmethod
+    def locate_virtual_points(segments, virtual_indx, curve_indx):
+        """
+        Finds the actual points the virtual ones are made of: each virtual point lies on the line between
+        the actual points index_from and index_to of its sequence, at the given ratio
+        :return: tuple of (index_from int array, index_to int array, ratio float array)
+        """
+        seg_start, seg_end, lengths, is_interp = segments
+        # Virtual sequences are laid out one after another, so all the segments are found with a single search
+        seg_last = np.cumsum(lengths, axis=1)
+        curve_first = np.concatenate(([0], seg_last[:-1, -1].cumsum()))
+        seg_indx = np.searchsorted((seg_last + curve_first[:, None]).reshape(-1),
+                                   virtual_indx + curve_first[curve_indx], side="right") % lengths.shape[1]
+        rows = (curve_indx, seg_indx)
+        offset = virtual_indx - seg_last[rows] + lengths[rows]
+
+        interp = is_interp[rows]
+        start = seg_start[rows]
+        # Points to tie the line with. Kept segments point directly at their own points
+        index_from = np.where(interp, start, start + offset)
+        index_to = np.where(interp, seg_end[rows], index_from)
+        ratio = np.where(interp, offset / np.maximum(lengths[rows], 1), 0.)
+        return index_from, index_to, ratio
+
+    @staticmethod
+    def evaluate_virtual_points(starts, ends, knots, knots_count, mid_pts_cnt, segments, virtual_indx, curve_indx):
+        """
+        Evaluates the points of the virtual sequences, described by the segments, at the given indices.
+        Straight segments are evaluated at their ends only
+        :return: (len(virtual_indx), 2) float array
+        """
+        index_from, index_to, ratio = HumanCurve.locate_virtual_points(segments, virtual_indx, curve_indx)
+        last = mid_pts_cnt[curve_indx] - 1
+        t_from = index_from / last
+        t_to = index_to / last
+
+        points_from = np.empty((curve_indx.shape[0], 2))
+        points_to = np.empty((curve_indx.shape[0], 2))
+        # Curves of the same order are evaluated together
+        for count in np.unique(knots_count):
+            is_count = knots_count[curve_indx] == count
+            group = curve_indx[is_count]
+            control = np.concatenate((starts[group, None], knots[group, :count], ends[group, None]), axis=1)
+            points_from[is_count] = BezierCurve.points_at(t_from[is_count], control)
+            points_to[is_count] = BezierCurve.points_at(t_to[is_count], control)
+
+        return points_from + (points_to - points_from) * ratio[:, None]
+
+    @staticmethod
+    def distortion_offsets(size, distortion_mean, distortion_stdev, distortion_frequency, rng):
+        """
+        Draws the distortion offsets of size points at once: normal offsets, masks of the distorted coords and signs.
+        Params may be either single values or (size, 1) arrays
+        :return: (size, 2) float array
+        """
+        delta = rng.normal(distortion_mean, distortion_stdev, size=(size, 2))
+        delta *= rng.random((size, 2)) < distortion_frequency
+        delta[:, 0] *= rng.choice([-1, 0, 1], size=size)
+        delta[:, 1] *= rng.choice([-1, 1], size=size)
+        return delta
+
+    @staticmethod
+    def distortion_deltas(virtual_indx, curve_indx, segments, distortion_mean, distortion_stdev,
+                          distortion_frequency, rng):
+        """
+        Distortion offsets of the points, picked from the virtual sequences, so that the curves are not ideally smooth.
+        Every virtual point is distorted once, so the points picked a few times stay equal.
+        First and last points of each virtual sequence are never distorted
+        :return: (P, 2) float array
+        """
+        total = segments[2].sum(axis=1)
+        key = virtual_indx + np.concatenate(([0], np.cumsum(total)[:-1]))[curve_indx]
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        unique_curve = curve_indx[first]
+        unique_indx = virtual_indx[first]
+
+        delta = HumanCurve.distortion_offsets(first.shape[0], distortion_mean[unique_curve, None],
+                                              distortion_stdev[unique_curve, None],
+                                              distortion_frequency[unique_curve, None], rng)
+        delta[(unique_indx == 0) | (unique_indx == total[unique_curve] - 1)] = 0.
+
+        return delta[inverse.reshape(-1)]
+
+    @staticmethod
+    def generate_internal_knots(left_boundary, right_boundary, down_boundary, up_boundary, knots_count, rng=None):
         """
         Generates the internal knots used during generation of Bezier curve points or any interpolation function.
         The points are taken at random from a surface delimited by given boundaries.
         Exactly knots_count internal knots are randomly generated.
+        :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
         """
         if not (is_numeric(left_boundary) and is_numeric(right_boundary) and
                 is_numeric(down_boundary) and is_numeric(up_boundary)):
@@ -107,64 +641,83 @@ class HumanCurve:
         if down_boundary > up_boundary:
             raise ValueError("down_boundary must be less than or equal to up_boundary")
 
-        knots_x = np.random.choice(range(left_boundary, right_boundary), size=knots_count)
-        knots_y = np.random.choice(range(down_boundary, up_boundary), size=knots_count)
+        rng = np.random.default_rng(rng)
+        knots_x = rng.choice(range(left_boundary, right_boundary), size=knots_count)
+        knots_y = rng.choice(range(down_boundary, up_boundary), size=knots_count)
         knots = list(zip(knots_x, knots_y))
         return knots
 
-    def generate_points(self, knots):
+    def generate_points(self, knots, validate: bool = True):
         """
         Generates Bezier curve points on a curve, according to the internal knots passed as parameter.
+        :param validate: check the knots. Pass False for (K, 2) arrays known to be valid
+        :return: (N, 2) float array
         """
-        if not is_list_of_points(knots):
-            raise ValueError("knots must be valid list of points")
+        knots = as_points(knots, "knots") if validate else np.asarray(knots, dtype=np.float64).reshape(-1, 2)
 
         mid_pts_cnt = max(abs(self.fromPoint[0] - self.toPoint[0]),
                           abs(self.fromPoint[1] - self.toPoint[1]),
                           2)
-        knots = [self.fromPoint] + knots + [self.toPoint]
+        knots = np.concatenate(([self.fromPoint], knots, [self.toPoint]))
         return BezierCurve.curve_points(mid_pts_cnt, knots)
 
     @staticmethod
-    def distort_points(points, distortion_mean, distortion_stdev, distortion_frequency):
+    def interpolate_points(points, interp_step, rng=None, validate: bool = True):
+        """
+        Replaces random parts of the curve described by (x,y) points with straight lines of a random number of points.
+        Same as generate_curve() does, but for the whole curve. The last point is not included
+        :param interp_step: number of curve's parts to apply linear interpolation to
+        :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
+        :param validate: check the points. Pass False for (N, 2) arrays known to be valid
+        :return: (M, 2) float array
+        """
+        points = as_points(points) if validate else points
+        if not isinstance(interp_step, (int, np.integer)) or interp_step < 0:
+            raise ValueError("interp_step must be non-negative integer")
+
+        segments = HumanCurve.plan_interpolation(np.array([max(points.shape[0], 2)]), np.array([interp_step]),
+                                                 np.random.default_rng(rng))
+        total = int(segments[2].sum())
+        index_from, index_to, ratio = HumanCurve.locate_virtual_points(segments, np.arange(total),
+                                                                       np.zeros(total, dtype=np.int64))
+        index_from = np.minimum(index_from, points.shape[0] - 1)
+        index_to = np.minimum(index_to, points.shape[0] - 1)
+        return points[index_from] + (points[index_to] - points[index_from]) * ratio[:, None]
+
+    @staticmethod
+    def distort_points(points, distortion_mean, distortion_stdev, distortion_frequency, rng=None,
+                       validate: bool = True):
         """
         Distorts the curve described by (x,y) points, so that the curve is not ideally smooth.
         Distortion happens by randomly, according to normal distribution, adding an offset to some of the points.
+        :param rng: numpy.random.Generator or a seed for a new one. Default = unpredictably seeded generator
+        :param validate: check the points. Pass False for (N, 2) arrays known to be valid
+        :return: (N, 2) float array
         """
         if not(is_numeric(distortion_mean) and is_numeric(distortion_stdev) and is_numeric(distortion_frequency)):
             raise ValueError("Distortions must be numeric")
-        if not is_list_of_points(points):
-            raise ValueError("points must be valid list of points")
         if not (0 <= distortion_frequency <= 1):
             raise ValueError("distortionFrequency must be in range [0,1]")
+        points = as_points(points) if validate else points
 
-        distorted = []
-        for i in range(1, len(points)-1):
-            x, y = points[i]
-            delta_y = np.random.normal(distortion_mean, distortion_stdev) if \
-                random.random() < distortion_frequency else 0
-            delta_x = np.random.normal(distortion_mean, distortion_stdev) if \
-                random.random() < distortion_frequency else 0
-            sign_y = random.choice([-1, 1])
-            sign_x = random.choice([-1, 0, 1])
-            distorted += (x + delta_x * sign_x, y + delta_y * sign_y),
-        distorted = [points[0]] + distorted + [points[-1]]
-        return distorted
+        delta = HumanCurve.distortion_offsets(points.shape[0], distortion_mean, distortion_stdev, distortion_frequency,
+                                              np.random.default_rng(rng))
+        # First and last points stay in place
+        delta[[0, -1]] = 0.
+        return points + delta
 
     @staticmethod
-    def tween_points(points, tween, target_points):
+    def tween_points(points, tween, target_points, validate: bool = True):
         """
         Chooses a number of points(targetPoints) from the list(points) according to tweening function(tween).
         This function in fact controls the velocity of mouse movement
+        :param validate: check the points. Pass False for (N, 2) arrays known to be valid
+        :return: (target_points, 2) float array
         """
-        if not is_list_of_points(points):
-            raise ValueError("points must be valid list of points")
         if not isinstance(target_points, int) or target_points < 2:
             raise ValueError("target_points must be an integer greater or equal to 2")
+        points = as_points(points) if validate else points
 
         # tween is a function that takes a float 0..1 and returns a float 0..1
-        res = []
-        for i in range(target_points):
-            index = int(tween(float(i)/(target_points-1)) * (len(points)-1))
-            res += points[index],
-        return res
+        progress = easing_table(get_easing(tween), target_points)
+        return points[np.trunc(progress * (points.shape[0] - 1)).astype(np.int64)]